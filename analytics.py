@@ -0,0 +1,199 @@
+# analytics.py
+import numpy as np
+import pandas as pd
+
+DAYS_PER_YEAR = 365.0
+
+
+def npv(flows, years, rate):
+    """Net present value of each row of flows at the matching row of rate"""
+    return (flows * (1.0 + rate[:, None]) ** -years).sum(axis=1)
+
+
+def xirr(amounts, days, guess=0.1, tol=1e-10, max_iter=100):
+    """Annualised IRR of every row of a 2-D cash-flow array, solved by batched Newton steps.
+
+    amounts holds signed flows (investments negative, proceeds positive) and
+    days their dates as days since the epoch; rows are padded with NaN (or
+    0) amounts. All rows are iterated together as arrays, so thousands of
+    portfolios cost about as much as one. Rows where Newton does not
+    converge (deep losses can overshoot) are bisected, again as one batch;
+    rows without both signs of flow get NaN.
+    """
+    amounts = np.atleast_2d(np.asarray(amounts, dtype=np.float64))
+    days = np.atleast_2d(np.asarray(days, dtype=np.float64))
+    valid = ~np.isnan(amounts) & (amounts != 0)
+    flows = np.where(valid, amounts, 0.0)
+    first = np.min(np.where(valid, days, np.inf), axis=1, keepdims=True)
+    years = np.where(valid, (days - first) / DAYS_PER_YEAR, 0.0)
+
+    rate = np.full(len(flows), guess)
+    active = (flows > 0).any(axis=1) & (flows < 0).any(axis=1)
+    solvable = active.copy()
+    for _ in range(max_iter):
+        if not active.any():
+            break
+        rows = np.flatnonzero(active)
+        base = 1.0 + rate[rows, None]
+        with np.errstate(over="ignore", divide="ignore", invalid="ignore"):
+            discounted = flows[rows] * base ** -years[rows]
+            slope = (-years[rows] * discounted / base).sum(axis=1)
+            step = discounted.sum(axis=1) / slope
+        new = rate[rows] - step
+        # Keep 1 + rate positive: step halfway towards -100% instead of past it
+        new = np.where(new <= -1.0, (rate[rows] - 1.0) / 2, new)
+        rate[rows] = new
+        active[rows] = ~(np.abs(step) < tol) & np.isfinite(new)
+    failed = solvable & (active | ~np.isfinite(rate))
+    if failed.any():
+        rate[failed] = bisect_rate(flows[failed], years[failed], tol)
+    rate[~solvable] = np.nan
+    return rate
+
+
+def bisect_rate(flows, years, tol=1e-10, low=-0.9999, high=100.0):
+    """Batched bisection for the IRR of each row (NaN where NPV does not change sign in the range)"""
+    low = np.full(len(flows), low)
+    high = np.full(len(flows), high)
+    with np.errstate(over="ignore", invalid="ignore"):
+        npv_low = npv(flows, years, low)
+        bracketed = np.sign(npv_low) != np.sign(npv(flows, years, high))
+        while (high - low).max() > tol:
+            mid = (low + high) / 2
+            npv_mid = npv(flows, years, mid)
+            same = np.sign(npv_mid) == np.sign(npv_low)
+            low = np.where(same, mid, low)
+            npv_low = np.where(same, npv_mid, npv_low)
+            high = np.where(same, high, mid)
+    return np.where(bracketed, (low + high) / 2, np.nan)
+
+
+def pad_flows(portfolios):
+    """Stack [(amounts, days), ...] of different lengths into NaN-padded 2-D arrays for xirr"""
+    width = max((len(amounts) for amounts, _ in portfolios), default=0)
+    amounts = np.full((len(portfolios), width), np.nan)
+    days = np.zeros((len(portfolios), width))
+    for i, (flow, when) in enumerate(portfolios):
+        amounts[i, :len(flow)] = flow
+        days[i, :len(when)] = when
+    return amounts, days
+
+
+def to_days(dates):
+    return np.asarray(dates, dtype="datetime64[D]").astype(np.int64)
+
+
+def fills(history):
+    """Investments with recorded fills as a date-indexed frame with running totals.
+
+    Records from before fills were recorded (no price) are left out.
+    """
+    rows = [record for record in history if record.get('price') and record.get('units')]
+    frame = pd.DataFrame({
+        "trigger": [record['trigger'] for record in rows],
+        "price": [record['price'] for record in rows],
+        "units": [record['units'] for record in rows],
+        "amount": [record['amount'] for record in rows]
+    }, index=pd.DatetimeIndex([record['date'] for record in rows], name="Date"))
+    frame["cum_units"] = frame["units"].cumsum()
+    frame["invested"] = frame["amount"].cumsum()
+    frame["avg_cost"] = frame["invested"] / frame["cum_units"]
+    return frame
+
+
+def value_series(fill_frame, prices):
+    """Daily holdings value and amount invested, valued at the ETF closes in prices"""
+    prices = prices[prices.index >= fill_frame.index[0]] if len(fill_frame) else prices.iloc[:0]
+    daily = fill_frame[["cum_units", "invested"]].groupby(level=0).last()
+    daily = daily.reindex(prices.index.union(daily.index)).ffill().reindex(prices.index)
+    return pd.DataFrame({
+        "value": daily["cum_units"] * prices,
+        "invested": daily["invested"],
+        "price": prices
+    })
+
+
+def drawdown(values):
+    """Fall from the running peak, as a fraction (0 at new highs)"""
+    return values / values.cummax() - 1
+
+
+def sip_fills(fill_frame, prices):
+    """The same total invested as an equal monthly SIP on each month's first session"""
+    prices = prices[(prices.index >= fill_frame.index[0])]
+    firsts = prices.groupby(prices.index.to_period("M")).head(1)
+    firsts = firsts[firsts.index <= fill_frame.index[-1]]
+    amount = fill_frame["amount"].sum() / len(firsts)
+    history = [{"date": day, "trigger": "SIP", "price": price, "units": amount / price, "amount": amount}
+               for day, price in firsts.items()]
+    return fills(history)
+
+
+def portfolio_flows(fill_frame, value, as_of):
+    """(amounts, days) cash flows: every investment out, the holding's value back in at as_of"""
+    return (np.append(-fill_frame["amount"].to_numpy(), value),
+            np.append(to_days(fill_frame.index.date), to_days([as_of])))
+
+
+def report(history, prices, as_of=None):
+    """Performance of the recorded investments against a monthly SIP of the same money.
+
+    prices is a date-indexed Series of ETF closes. XIRRs of both are solved
+    in one batched call.
+    """
+    fill_frame = fills(history)
+    if fill_frame.empty or prices.empty:
+        return None
+    prices = prices[prices.index <= pd.Timestamp(as_of)] if as_of is not None else prices
+    as_of = prices.index[-1].date()
+    final_price = prices.iloc[-1]
+
+    sip = sip_fills(fill_frame, prices)
+    value = fill_frame["cum_units"].iloc[-1] * final_price
+    sip_value = sip["cum_units"].iloc[-1] * final_price
+    rates = xirr(*pad_flows([portfolio_flows(fill_frame, value, as_of), portfolio_flows(sip, sip_value, as_of)]))
+
+    series = value_series(fill_frame, prices)
+    growth = series["value"] / series["invested"]  # value per rupee invested, so new money is not a "gain"
+    return {
+        "as_of": as_of.isoformat(),
+        "investments": len(fill_frame),
+        "invested": float(fill_frame["invested"].iloc[-1]),
+        "units": float(fill_frame["cum_units"].iloc[-1]),
+        "avg_cost": float(fill_frame["avg_cost"].iloc[-1]),
+        "value": float(value),
+        "xirr_pct": float(rates[0] * 100),
+        "max_drawdown_pct": float(drawdown(growth).min() * 100),
+        "sip_avg_cost": float(sip["avg_cost"].iloc[-1]),
+        "sip_value": float(sip_value),
+        "sip_xirr_pct": float(rates[1] * 100),
+        "excess_xirr_pct": float((rates[0] - rates[1]) * 100)
+    }
+
+
+def history_flows(history, value, as_of):
+    """portfolio_flows of the investments with recorded fills, read straight from the records"""
+    rows = [record for record in history if record.get('price') and record.get('units')]
+    amounts = np.fromiter((-record['amount'] for record in rows), dtype=np.float64, count=len(rows))
+    days = to_days([record['date'][:10] for record in rows])
+    return np.append(amounts, value), np.append(days, to_days([as_of]))
+
+
+def batch_xirr(histories, values, as_of):
+    """XIRR of many portfolios (histories with fills, each valued at values[i] on as_of) in one solve"""
+    return xirr(*pad_flows([history_flows(history, value, as_of) for history, value in zip(histories, values)]))
+
+
+if __name__ == "__main__":
+    from bar_store import bars_to_frame
+    from nifty_agent import NiftyInvestmentAgent
+
+    agent = NiftyInvestmentAgent()
+    agent.etf_price()  # top up the ETF bars
+    prices = bars_to_frame(agent.bar_store.load(agent.icici_nifty_etf))["Close"]
+    result = report(agent.state['investment_history'], prices)
+    if result is None:
+        print("No investments with recorded fills yet")
+    else:
+        for key, value in result.items():
+            print(f"{key}: {value:.2f}" if isinstance(value, float) else f"{key}: {value}")
@@ -0,0 +1,27 @@
+# atomic_io.py
+import os
+import threading
+from contextlib import contextmanager
+
+
+@contextmanager
+def atomic_write(path, mode="w"):
+    """Open a temp file to write path through; on success it is fsynced and renamed over path.
+
+    Readers never see a partial file. The temp name is unique to the process
+    and thread, so the dashboard, scheduler and intraday processes can
+    refresh the same file without writing into each other's temp file.
+    """
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, mode) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
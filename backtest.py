@@ -0,0 +1,147 @@
+# backtest.py
+import numpy as np
+import pandas as pd
+from records import TRIGGER_TYPES
+
+# Thresholds used by NiftyInvestmentAgent.check_triggers
+DEFAULT_PARAMS = {
+    "dip_threshold": -2.5,  # % distance below the SMA
+    "vix_level": 22.0,
+    "sma_window": 20,
+    "time_days": 20  # trading days without an investment
+}
+
+
+def rolling_sma(closes, window):
+    """Trailing simple moving average of every bar, NaN for the first window-1 bars"""
+    csum = np.concatenate([[0.0], np.cumsum(closes, dtype=np.float64)])
+    sma = np.full(len(closes), np.nan)
+    if len(closes) >= window:
+        sma[window - 1:] = (csum[window:] - csum[:-window]) / window
+    return sma
+
+
+def trigger_masks(closes, vix, sma, dip_threshold=-2.5, vix_level=22.0):
+    """PRICE_DIP and VOLATILITY_SPIKE conditions for every bar as boolean arrays"""
+    with np.errstate(invalid="ignore"):
+        dip_pct = (closes - sma) / sma * 100
+        # NaN (no SMA or VIX yet) compares False, like a missing value in check_triggers
+        return dip_pct <= dip_threshold, vix > vix_level
+
+
+def select_signal_days(signal, time_days=20):
+    """Indices of investment days given the days any signal trigger fires.
+
+    Mirrors daily_check: the first signal invests, and after every investment
+    the next one happens on the next signal day or time_days bars later,
+    whichever comes first. The loop runs once per investment, not per day.
+    A time_days below 1 invests every day, as days_since >= 0 would live.
+    """
+    time_days = max(int(time_days), 1)
+    signal_idx = np.flatnonzero(signal)
+    n = len(signal)
+    if not len(signal_idx):
+        return np.empty(0, dtype=np.int64)
+
+    # Jump table: the bar after which an investment on bar i is followed by the next one
+    positions = np.arange(n)
+    k = np.searchsorted(signal_idx, positions, side="right")
+    next_signal = np.append(signal_idx, n)[k]
+    jump = np.minimum(next_signal, positions + time_days).tolist()
+
+    invest_idx = []
+    i = int(signal_idx[0])
+    while i < n:
+        invest_idx.append(i)
+        i = jump[i]
+    return np.asarray(invest_idx, dtype=np.int64)
+
+
+def select_investments(price_dip, volatility_spike, time_days=20):
+    """Indices of investment days and the trigger code that fired on each"""
+    invest_idx = select_signal_days(price_dip | volatility_spike, time_days)
+    codes = np.where(price_dip[invest_idx], 0, np.where(volatility_spike[invest_idx], 1, 2))
+    return invest_idx, codes.astype(np.int8)
+
+
+def fill_investments(invest_idx, codes, prices, amount=1.0):
+    """Buy `amount` worth of units at prices on every investment day and value the holding"""
+    units = amount / prices[invest_idx]
+    invested = amount * len(invest_idx)
+    portfolio_value = units.sum() * prices[-1] if len(prices) else 0.0
+    return {
+        "index": invest_idx,
+        "codes": codes,
+        "prices": prices[invest_idx],
+        "units": units,
+        "invested": invested,
+        "portfolio_value": portfolio_value,
+        "return_pct": (portfolio_value / invested - 1) * 100 if invested else 0.0
+    }
+
+
+def backtest_arrays(closes, vix, prices=None, amount=1.0, sma=None,
+                    dip_threshold=-2.5, vix_level=22.0, sma_window=20, time_days=20):
+    """Run the trigger strategy over aligned close/VIX arrays.
+
+    prices are the fill prices (e.g. ETF closes) and default to the index
+    closes; every investment buys `amount` worth of units. A precomputed
+    sma array for sma_window may be passed to skip recomputing it.
+    """
+    closes = np.asarray(closes, dtype=np.float64)
+    vix = np.asarray(vix, dtype=np.float64)
+    prices = closes if prices is None else np.asarray(prices, dtype=np.float64)
+    if sma is None:
+        sma = rolling_sma(closes, sma_window)
+
+    price_dip, volatility_spike = trigger_masks(closes, vix, sma, dip_threshold, vix_level)
+    invest_idx, codes = select_investments(price_dip, volatility_spike, time_days)
+
+    return fill_investments(invest_idx, codes, prices, amount)
+
+
+def align_bars(nifty_hist, vix_hist, etf_hist=None):
+    """Align history frames on the NIFTY dates; VIX/ETF gaps carry the last close forward"""
+    dates = nifty_hist.index
+    closes = nifty_hist['Close']
+    vix = vix_hist['Close'].reindex(dates).ffill()
+    aligned = {"dates": dates, "closes": closes.to_numpy(np.float64), "vix": vix.to_numpy(np.float64)}
+
+    if etf_hist is not None and not etf_hist.empty:
+        etf = etf_hist['Close'].reindex(dates).ffill()
+        first = etf.first_valid_index()
+        if first is not None:
+            # Before the ETF listed, price it off the index at the ETF's first index ratio
+            aligned["prices"] = etf.fillna(closes * (etf[first] / closes[first])).to_numpy(np.float64)
+    return aligned
+
+
+def run_backtest(nifty_hist, vix_hist, etf_hist=None, amount=1.0, rules=None, **params):
+    """Backtest the trigger rules over history frames.
+
+    With a rules.RuleSet the declared rules are replayed (their codes index
+    rules.names); otherwise the built-in triggers with params. Returns the
+    investment dates, trigger types, fill prices, ETF units bought, the
+    amount invested and the final portfolio value.
+    """
+    aligned = align_bars(nifty_hist, vix_hist, etf_hist)
+    if rules is not None:
+        result = rules.backtest(aligned["closes"], aligned["vix"], aligned.get("prices"), amount)
+        names = rules.names
+    else:
+        result = backtest_arrays(aligned["closes"], aligned["vix"], aligned.get("prices"), amount,
+                                 **{**DEFAULT_PARAMS, **params})
+        names = TRIGGER_TYPES
+    result["dates"] = [day.date().isoformat() for day in aligned["dates"][result["index"]]]
+    result["triggers"] = [names[code] for code in result["codes"]]
+    return result
+
+
+def investments_frame(result):
+    """Tabulate the investments of a backtest result"""
+    return pd.DataFrame({
+        "date": result["dates"],
+        "trigger": result["triggers"],
+        "price": result["prices"],
+        "units": result["units"]
+    })
@@ -0,0 +1,128 @@
+# bar_store.py
+import os
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+from atomic_io import atomic_write
+from metrics import METRICS
+
+EPOCH = date(1970, 1, 1)
+
+# One fixed-width record per daily bar; dates are stored as days since the epoch
+BAR_DTYPE = np.dtype([
+    ("date", "<i4"),
+    ("open", "<f8"),
+    ("high", "<f8"),
+    ("low", "<f8"),
+    ("close", "<f8"),
+    ("volume", "<f8"),
+])
+COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+
+
+def to_days(day):
+    """Convert a date to int days since the epoch"""
+    return (day - EPOCH).days
+
+
+def from_days(days):
+    """Convert int days since the epoch back to a date"""
+    return EPOCH + timedelta(days=int(days))
+
+
+def frame_to_bars(frame):
+    """Convert a yfinance history frame into a BAR_DTYPE array"""
+    bars = np.empty(len(frame), dtype=BAR_DTYPE)
+    if frame.empty:
+        return bars
+    index = pd.DatetimeIndex(frame.index)
+    bars["date"] = np.asarray(index.date, dtype="datetime64[D]").astype(np.int64)
+    for column in COLUMNS:
+        values = frame[column] if column in frame else np.nan
+        bars[column.lower()] = np.asarray(values, dtype=np.float64)
+    # yfinance occasionally repeats the last bar; keep the newest copy of each date
+    _, last = np.unique(bars["date"][::-1], return_index=True)
+    return bars[len(bars) - 1 - last]
+
+
+def bars_to_frame(bars):
+    """Convert a BAR_DTYPE array into a date-indexed OHLCV frame"""
+    index = pd.DatetimeIndex(np.asarray(bars["date"], dtype="datetime64[D]"), name="Date")
+    return pd.DataFrame({column: np.asarray(bars[column.lower()]) for column in COLUMNS}, index=index)
+
+
+class BarStore:
+    """Persistent per-symbol daily bar store backed by memory-mapped .npy files"""
+
+    def __init__(self, root="market_data"):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, symbol):
+        name = symbol.replace("^", "_").replace(".", "_")
+        return os.path.join(self.root, f"{name}.npy")
+
+    def load(self, symbol):
+        """Return all stored bars for symbol (read-only memory map)"""
+        path = self.path(symbol)
+        if not os.path.exists(path):
+            return np.empty(0, dtype=BAR_DTYPE)
+        return np.load(path, mmap_mode="r")
+
+    def last_date(self, symbol):
+        bars = self.load(symbol)
+        return from_days(bars["date"][-1]) if len(bars) else None
+
+    def write(self, symbol, frame):
+        """Merge freshly fetched bars into the store; fetched bars replace stored ones with the same date"""
+        new = frame_to_bars(frame)
+        if not len(new):
+            return self.load(symbol)
+
+        old = self.load(symbol)
+        merged = np.concatenate([old[~np.isin(old["date"], new["date"])], new])
+        merged = merged[np.argsort(merged["date"], kind="stable")]
+
+        with atomic_write(self.path(symbol), "wb") as f:
+            np.save(f, merged)
+        return self.load(symbol)
+
+    def update(self, symbol, fetch, period="1mo"):
+        """Top up symbol with only the missing bars and return all stored bars.
+
+        fetch is a yfinance-style history callable. An empty store is seeded
+        with fetch(period=period); afterwards only bars from the last stored
+        date onward are requested, so a partial bar for today is replaced.
+        """
+        last = self.last_date(symbol)
+        try:
+            if last is None:
+                return self.write(symbol, fetch(period=period))
+            return self.write(symbol, fetch(start=last.isoformat()))
+        except Exception as e:
+            METRICS.inc("fetch_errors", symbol=symbol)
+            if last is None:
+                raise
+            print(f"Failed to refresh {symbol}, using stored bars: {e}")
+            return self.load(symbol)
+
+    def refresh(self, symbol, fetch, period="1mo", lookback=None):
+        """update() symbol and return its latest `lookback` bars as a frame"""
+        bars = self.update(symbol, fetch, period)
+        if lookback is not None:
+            bars = bars[-lookback:]
+        return bars_to_frame(bars)
+
+    def backfill(self, symbol, fetch, start):
+        """Make sure bars from start onward are stored and return them as a frame"""
+        stored = self.load(symbol)
+        if not len(stored):
+            self.write(symbol, fetch(start=start))
+        elif from_days(stored["date"][0]) > date.fromisoformat(start):
+            self.write(symbol, fetch(start=start, end=from_days(stored["date"][0]).isoformat()))
+            self.update(symbol, fetch)
+        else:
+            self.update(symbol, fetch)
+
+        bars = self.load(symbol)
+        return bars_to_frame(bars[bars["date"] >= to_days(date.fromisoformat(start))])
@@ -0,0 +1,124 @@
+# batch.py
+from datetime import date, timedelta
+import numpy as np
+from backtest import DEFAULT_PARAMS, TRIGGER_TYPES
+from state_store import JournalStateStore
+from trading_calendar import nse_calendar, to_date
+
+
+class PortfolioBatch:
+    """Trigger state of many portfolios held as NumPy arrays and evaluated in one step.
+
+    Each portfolio has its own thresholds and last investment date, from
+    which its days-since-investment counter is derived on the NSE calendar;
+    the market data (NIFTY closes and VIX) is fetched once and shared.
+    """
+
+    def __init__(self, ids, params=None, last_investment_dates=None):
+        n = len(ids)
+        self.ids = list(ids)
+        params = params or [{}] * n
+        merged = [{**DEFAULT_PARAMS, **p} for p in params]
+        self.dip_threshold = np.array([p['dip_threshold'] for p in merged], dtype=np.float64)
+        self.vix_level = np.array([p['vix_level'] for p in merged], dtype=np.float64)
+        self.sma_window = np.array([p['sma_window'] for p in merged], dtype=np.int64)
+        self.time_days = np.array([p['time_days'] for p in merged], dtype=np.int64)
+        # Day ordinals of the last investments, -1 for portfolios that have not invested
+        dates = last_investment_dates or [None] * n
+        self.last_investment = np.array([to_date(day).toordinal() if day else -1 for day in dates], dtype=np.int64)
+        self.days_since = self.sessions_since(date.today())
+
+    @property
+    def has_invested(self):
+        return self.last_investment >= 0
+
+    def sessions_since(self, day):
+        """Sessions after each portfolio's last investment up to day (0 before the first)"""
+        ordinals = np.asarray(nse_calendar().ordinals, dtype=np.int64)
+        end = np.searchsorted(ordinals, to_date(day).toordinal(), side="right")
+        start = np.searchsorted(ordinals, self.last_investment, side="right")
+        return np.where(self.has_invested, np.maximum(end - start, 0), 0)
+
+    @classmethod
+    def from_states(cls, states, params=None):
+        """Build from {portfolio_id: agent state dict} and optional {portfolio_id: params}"""
+        ids = list(states)
+        params = params or {}
+        return cls(
+            ids,
+            [params.get(pid, {}) for pid in ids],
+            [states[pid]['last_investment_date'] for pid in ids]
+        )
+
+    @classmethod
+    def from_state_files(cls, paths, params=None):
+        """Build from {portfolio_id: investment_state.json path}"""
+        return cls.from_states({pid: JournalStateStore(path).load() for pid, path in paths.items()}, params)
+
+    @property
+    def max_window(self):
+        return int(self.sma_window.max())
+
+    def evaluate(self, closes, vix):
+        """Trigger codes for every portfolio (-1 where nothing fires).
+
+        closes holds at least max_window recent NIFTY closes, newest last;
+        each distinct SMA window is computed once and shared.
+        """
+        closes = np.asarray(closes, dtype=np.float64)
+        windows, which = np.unique(self.sma_window, return_inverse=True)
+        csum = np.concatenate([[0.0], np.cumsum(closes[::-1])])
+        sma_by_window = np.where(windows <= len(closes), csum[np.minimum(windows, len(closes))] / windows, np.nan)
+        sma = sma_by_window[which]
+
+        with np.errstate(invalid="ignore"):
+            dip_pct = (closes[-1] - sma) / sma * 100
+            price_dip = dip_pct <= self.dip_threshold
+        if vix is None or np.isnan(vix):
+            volatility_spike = np.zeros(len(self.ids), dtype=bool)
+        else:
+            volatility_spike = vix > self.vix_level
+        time_based = self.days_since >= self.time_days
+
+        # Same precedence as check_triggers: the first matching trigger is executed
+        return np.select([price_dip, volatility_spike, time_based], [0, 1, 2], -1), dip_pct
+
+    def daily_check(self, closes, vix, day=None):
+        """Evaluate all portfolios on day (default today) and record investments.
+
+        Counters are derived from the last investment dates, so repeated runs
+        on one day and days without a run are counted correctly. Returns the
+        portfolios that must invest today with their trigger.
+        """
+        day = to_date(day or date.today())
+        self.days_since = self.sessions_since(day)
+        codes, dip_pct = self.evaluate(closes, vix)
+        fired = np.flatnonzero(codes >= 0)
+
+        self.days_since[fired] = 0
+        self.last_investment[fired] = day.toordinal()
+        return [{
+            "portfolio": self.ids[i],
+            "date": day.isoformat(),
+            "trigger": TRIGGER_TYPES[codes[i]],
+            "message": self.trigger_message(codes[i], i, dip_pct[i], vix)
+        } for i in fired]
+
+    def trigger_message(self, code, i, dip_pct, vix):
+        if code == 0:
+            return f"Nifty 50 closed {abs(dip_pct):.2f}% below {self.sma_window[i]}-Day SMA"
+        if code == 1:
+            return f"India VIX closed at {vix:.2f} (above {self.vix_level[i]:g})"
+        return f"{self.time_days[i]} trading days have passed since last investment"
+
+
+def fetch_shared_market(agent, batch):
+    """Fetch NIFTY closes covering every portfolio's SMA window plus the latest VIX, once"""
+    # Calendar days comfortably covering max_window sessions, weekends and holidays included
+    start = (agent.provider.now().date() - timedelta(days=2 * batch.max_window + 14)).isoformat()
+    pool = agent.executor()
+    nifty = pool.submit(agent.bar_store.backfill, agent.nifty_symbol, agent.provider.fetcher(agent.nifty_symbol), start)
+    vix = pool.submit(agent.bar_store.refresh, agent.vix_symbol, agent.provider.fetcher(agent.vix_symbol), lookback=1)
+    nifty_hist, vix_data = nifty.result(), vix.result()
+    return (nifty_hist['Close'].to_numpy()[-batch.max_window:],
+            vix_data['Close'].iloc[-1] if not vix_data.empty else None)
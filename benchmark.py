@@ -0,0 +1,169 @@
+# benchmark.py
+import argparse
+import json
+import os
+import platform
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+import pandas as pd
+from nifty_agent import NiftyInvestmentAgent
+from providers import SyntheticProvider, replay
+from state_store import make_state_store
+
+DEFAULT_SIZES = [10, 1000, 100000, 1000000]
+TRIGGERS = ["PRICE_DIP", "VOLATILITY_SPIKE", "TIME_BASED"]
+
+
+def measure(fn, repeat=5, setup=None):
+    """Run fn `repeat` times (after optional per-run setup) and summarise wall times in ms"""
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - started) * 1000)
+    return {"median_ms": statistics.median(times), "min_ms": min(times), "max_ms": max(times), "runs": repeat}
+
+
+def make_history(n):
+    """n synthetic investment_history records shaped like execute_investment's"""
+    start = date(2000, 1, 3)
+
+    def message(i):
+        # As the default rules format them from the record's values
+        if TRIGGERS[i % 3] == "PRICE_DIP":
+            return f"Nifty 50 closed {2.5 + (i % 100) / 100:.2f}% below 20-Day SMA"
+        if TRIGGERS[i % 3] == "VOLATILITY_SPIKE":
+            return f"India VIX closed at {15.0 + i % 10:.2f} (above 22)"
+        return "20 trading days have passed since last investment"
+
+    return [{
+        "date": (start + timedelta(days=i)).isoformat(),
+        "trigger": TRIGGERS[i % 3],
+        "message": message(i),
+        "price": 200.0 + i % 50,
+        "units": 10000.0 / (200.0 + i % 50),
+        "amount": 10000.0,
+        "close": 20000.0 - (2.5 + (i % 100) / 100) * 200,
+        "sma": 20000.0,
+        "vix": 15.0 + i % 10,
+        "days_since": float(i % 20)
+    } for i in range(n)]
+
+
+def bench_agent(results, repeat, workdir):
+    provider = SyntheticProvider(n_days=2520, seed=0)
+    store = make_state_store("json", os.path.join(workdir, "bench_agent_state.json"))
+    agent = NiftyInvestmentAgent(provider=provider, store=store)
+    agent.user_phone = None  # never text the configured number from a benchmark
+
+    def reset_bars():
+        for name in os.listdir(agent.bar_store.root):
+            os.remove(os.path.join(agent.bar_store.root, name))
+        agent.sma = type(agent.sma)(agent.sma.window)
+
+    results["fetch_market_data_cold"] = measure(agent.fetch_market_data, repeat, setup=reset_bars)
+    results["fetch_market_data_warm"] = measure(agent.fetch_market_data, repeat)
+
+    market_data = agent.fetch_market_data()
+    results["check_triggers_x1000"] = measure(lambda: [agent.check_triggers(market_data) for _ in range(1000)], repeat)
+
+    def replay_year():
+        reset_bars()
+        replay(agent, start=provider.index[-252])
+    results["daily_check_replay_252_days"] = measure(replay_year, 1)
+
+
+def bench_state(results, sizes, repeat, backends):
+    for backend in backends:
+        for n in sizes:
+            path = f"bench_{backend}_{n}.json"
+            store = make_state_store(backend, path)
+            state = {"last_investment_date": None, "trading_days_since_last_investment": 0,
+                     "investment_history": make_history(n)}
+            started = time.perf_counter()
+            store.save(state)
+            results[f"state_{backend}_initial_save_{n}"] = {
+                "median_ms": (time.perf_counter() - started) * 1000, "runs": 1
+            }
+
+            def append_and_save():
+                state['trading_days_since_last_investment'] += 1
+                state['investment_history'].append(make_history(1)[0])
+                store.save(state)
+            results[f"state_{backend}_save_append_{n}"] = measure(append_and_save, repeat)
+
+            reader = make_state_store(backend, path)
+            results[f"state_{backend}_load_{n}"] = measure(reader.load, min(repeat, 3) if n >= 100000 else repeat)
+
+            def dashboard_prep():
+                # What dashboard_nifty50.py does with history on every rerun
+                count = reader.history_count()
+                pd.DataFrame(reader.history_page(limit=50, offset=0))
+                pd.Series(reader.trigger_counts())
+                return count
+            results[f"dashboard_prep_{backend}_{n}"] = measure(dashboard_prep, min(repeat, 3) if n >= 100000 else repeat)
+
+
+def compare(results, baseline_path, tolerance=0.2):
+    """Print each benchmark against a baseline run; flags slowdowns beyond tolerance"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)["results"]
+    regressions = 0
+    for name, stats in results.items():
+        if name not in baseline:
+            continue
+        ratio = stats["median_ms"] / max(baseline[name]["median_ms"], 1e-9)
+        flag = "SLOWER" if ratio > 1 + tolerance else ("faster" if ratio < 1 - tolerance else "")
+        regressions += flag == "SLOWER"
+        print(f"{name:45s} {baseline[name]['median_ms']:12.3f} -> {stats['median_ms']:12.3f} ms  x{ratio:6.2f} {flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the agent hot paths against synthetic data")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="history sizes for state benchmarks")
+    parser.add_argument("--backends", nargs="+", default=["json", "compact", "sqlite"])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="results JSON path (default benchmark_results/<timestamp>.json)")
+    parser.add_argument("--compare", help="baseline results JSON to compare against")
+    args = parser.parse_args(argv)
+
+    output = os.path.abspath(args.output or os.path.join(
+        "benchmark_results", time.strftime("%Y%m%d-%H%M%S") + ".json"))
+    baseline = os.path.abspath(args.compare) if args.compare else None
+
+    results = {}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        # The agent keeps its state, bar store and outbox relative to the working directory
+        os.chdir(workdir)
+        try:
+            bench_agent(results, args.repeat, workdir)
+            bench_state(results, args.sizes, args.repeat, args.backends)
+        finally:
+            os.chdir(cwd)
+
+    for name, stats in results.items():
+        print(f"{name:45s} {stats['median_ms']:12.3f} ms")
+
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "results": results
+        }, f, indent=4)
+    print(f"Results written to {output}")
+
+    if baseline:
+        return 1 if compare(results, baseline) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,119 @@
+# breadth.py
+import os
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# NIFTY 50 constituents (Yahoo symbols) after the September 2025 index review.
+# Override with a comma-separated NIFTY50_CONSTITUENTS after a rebalance.
+NIFTY50_SYMBOLS = [
+    "ADANIENT.NS", "ADANIPORTS.NS", "APOLLOHOSP.NS", "ASIANPAINT.NS", "AXISBANK.NS",
+    "BAJAJ-AUTO.NS", "BAJFINANCE.NS", "BAJAJFINSV.NS", "BEL.NS", "BHARTIARTL.NS",
+    "CIPLA.NS", "COALINDIA.NS", "DRREDDY.NS", "EICHERMOT.NS", "ETERNAL.NS",
+    "GRASIM.NS", "HCLTECH.NS", "HDFCBANK.NS", "HDFCLIFE.NS", "HINDALCO.NS",
+    "HINDUNILVR.NS", "ICICIBANK.NS", "INDIGO.NS", "INFY.NS", "ITC.NS",
+    "JIOFIN.NS", "JSWSTEEL.NS", "KOTAKBANK.NS", "LT.NS", "M&M.NS",
+    "MARUTI.NS", "MAXHEALTH.NS", "NESTLEIND.NS", "NTPC.NS", "ONGC.NS",
+    "POWERGRID.NS", "RELIANCE.NS", "SBILIFE.NS", "SBIN.NS", "SHRIRAMFIN.NS",
+    "SUNPHARMA.NS", "TATACONSUM.NS", "TATAMOTORS.NS", "TATASTEEL.NS", "TCS.NS",
+    "TECHM.NS", "TITAN.NS", "TRENT.NS", "ULTRACEMCO.NS", "WIPRO.NS"
+]
+
+# Thresholds for the BREADTH_WEAK and NEW_LOWS triggers
+BREADTH_PARAMS = {
+    "breadth_below_sma_pct": 80.0,  # % of constituents below their 20-day SMA
+    "new_lows_pct": 20.0  # % of constituents at a 52-week closing low
+}
+
+
+def constituents():
+    override = os.getenv('NIFTY50_CONSTITUENTS')
+    return [symbol.strip() for symbol in override.split(",")] if override else list(NIFTY50_SYMBOLS)
+
+
+def forward_fill(matrix):
+    """Carry the last valid value down each column (dates x symbols)"""
+    rows = np.arange(len(matrix))[:, None]
+    last_valid = np.where(np.isnan(matrix), 0, rows)
+    np.maximum.accumulate(last_valid, axis=0, out=last_valid)
+    return matrix[last_valid, np.arange(matrix.shape[1])]
+
+
+def price_matrix(bar_store, symbols, lookback=None):
+    """Aligned (dates x symbols) close matrix from the bar store; gaps are forward-filled"""
+    bars = [bar_store.load(symbol) for symbol in symbols]
+    if lookback is not None:
+        bars = [symbol_bars[-lookback:] for symbol_bars in bars]
+    dates = np.unique(np.concatenate([symbol_bars["date"] for symbol_bars in bars]))
+    if lookback is not None:
+        dates = dates[-lookback:]
+
+    closes = np.full((len(dates), len(symbols)), np.nan)
+    for column, symbol_bars in enumerate(bars):
+        rows = np.searchsorted(dates, symbol_bars["date"])
+        keep = (rows < len(dates)) & (dates[np.minimum(rows, len(dates) - 1)] == symbol_bars["date"])
+        closes[rows[keep], column] = symbol_bars["close"][keep]
+    return dates, forward_fill(closes)
+
+
+def breadth_signals(closes, sma_window=20, low_window=252):
+    """Breadth series for every date of a (dates x symbols) close matrix, in one pass.
+
+    pct_below_sma: % of stocks closing below their own SMA
+    advances / declines: stocks up / down versus the previous close
+    new_lows: stocks closing at their lowest close of the last low_window bars
+    Dates without enough history for a statistic count that stock as not
+    qualifying.
+    """
+    n_dates, n_symbols = closes.shape
+    valid = ~np.isnan(closes)
+    filled = np.where(valid, closes, 0.0)
+
+    csum = np.vstack([np.zeros(n_symbols), np.cumsum(filled, axis=0)])
+    count = np.vstack([np.zeros(n_symbols), np.cumsum(valid, axis=0)])
+    sma = np.full(closes.shape, np.nan)
+    if n_dates >= sma_window:
+        full = (count[sma_window:] - count[:-sma_window]) == sma_window
+        sma[sma_window - 1:] = np.where(full, (csum[sma_window:] - csum[:-sma_window]) / sma_window, np.nan)
+
+    change = np.full(closes.shape, np.nan)
+    change[1:] = closes[1:] - closes[:-1]
+
+    lows = np.full(closes.shape, np.nan)
+    window = min(low_window, n_dates)
+    lows[window - 1:] = sliding_window_view(closes, window, axis=0).min(axis=-1)
+
+    with np.errstate(invalid="ignore"):
+        counted = np.maximum(valid.sum(axis=1), 1)
+        return {
+            "pct_below_sma": (closes < sma).sum(axis=1) / counted * 100,
+            "advances": (change > 0).sum(axis=1),
+            "declines": (change < 0).sum(axis=1),
+            "new_lows": ((closes <= lows) & ~np.isnan(lows)).sum(axis=1)
+        }
+
+
+class BreadthEngine:
+    """Breadth signals over the NIFTY 50 constituents kept in the bar store"""
+
+    def __init__(self, bar_store, symbols=None, sma_window=20, low_window=252):
+        self.bar_store = bar_store
+        self.symbols = symbols or constituents()
+        self.sma_window = sma_window
+        self.low_window = low_window
+
+    def matrix(self, lookback=None):
+        return price_matrix(self.bar_store, self.symbols, lookback)
+
+    def latest(self):
+        """Breadth readings for the latest date, as market_data fields"""
+        dates, closes = self.matrix(lookback=self.low_window)
+        signals = breadth_signals(closes, self.sma_window, self.low_window)
+        advances, declines = int(signals["advances"][-1]), int(signals["declines"][-1])
+        return {
+            "pct_below_sma": float(signals["pct_below_sma"][-1]),
+            "advances": advances,
+            "declines": declines,
+            "advance_decline": advances / max(declines, 1),
+            "new_lows": int(signals["new_lows"][-1]),
+            "new_lows_pct": signals["new_lows"][-1] / len(self.symbols) * 100
+        }
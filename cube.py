@@ -0,0 +1,259 @@
+# cube.py
+import os
+import numpy as np
+from atomic_io import atomic_write
+from backtest import TRIGGER_TYPES, rolling_sma
+
+# One row per session; sma is the trailing SMA of close, vix the day's (carried forward) VIX close
+DAY_DTYPE = np.dtype([
+    ("date", "<i4"),
+    ("open", "<f8"),
+    ("high", "<f8"),
+    ("low", "<f8"),
+    ("close", "<f8"),
+    ("volume", "<f8"),
+    ("sma", "<f8"),
+    ("vix", "<f8"),
+])
+
+# One row per week/month; dates are days since the epoch of the first and last session
+PERIOD_DTYPE = np.dtype([
+    ("start", "<i4"),
+    ("end", "<i4"),
+    ("open", "<f8"),
+    ("high", "<f8"),
+    ("low", "<f8"),
+    ("close", "<f8"),
+    ("volume", "<f8"),
+    ("sma", "<f8"),  # SMA at the period's last session
+    ("vix_mean", "<f8"),
+    ("vix_max", "<f8"),
+    ("vix_close", "<f8"),
+    ("sessions", "<i2"),
+    ("days_below_sma", "<i2"),
+])
+
+TIMEFRAMES = {"D": "Daily", "W": "Weekly", "M": "Monthly"}
+
+
+def period_keys(days, timeframe):
+    """Week (Monday-based) or month number of each day"""
+    if timeframe == "W":
+        return (days.astype(np.int64) + 3) // 7  # 1970-01-01 was a Thursday
+    return np.asarray(days, dtype="datetime64[D]").astype("datetime64[M]").astype(np.int64)
+
+
+def aggregate(days, triggers, timeframe):
+    """Roll daily rows (and their trigger counts) up into weekly or monthly rows"""
+    if not len(days):
+        return np.empty(0, dtype=PERIOD_DTYPE), np.zeros((0, triggers.shape[1]), dtype=np.int32)
+    keys = period_keys(days["date"], timeframe)
+    starts = np.flatnonzero(np.diff(keys, prepend=keys[0] - 1))
+    ends = np.append(starts[1:], len(days)) - 1
+    sessions = np.diff(np.append(starts, len(days)))
+
+    vix = days["vix"]
+    has_vix = ~np.isnan(vix)
+    vix_count = np.add.reduceat(has_vix, starts)
+    with np.errstate(invalid="ignore"):
+        below = days["close"] < days["sma"]
+
+    periods = np.empty(len(starts), dtype=PERIOD_DTYPE)
+    periods["start"] = days["date"][starts]
+    periods["end"] = days["date"][ends]
+    periods["open"] = days["open"][starts]
+    periods["high"] = np.fmax.reduceat(days["high"], starts)
+    periods["low"] = np.fmin.reduceat(days["low"], starts)
+    periods["close"] = days["close"][ends]
+    periods["volume"] = np.add.reduceat(np.nan_to_num(days["volume"]), starts)
+    periods["sma"] = days["sma"][ends]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        periods["vix_mean"] = np.add.reduceat(np.where(has_vix, vix, 0.0), starts) / vix_count
+    periods["vix_max"] = np.fmax.reduceat(vix, starts)
+    periods["vix_close"] = vix[ends]
+    periods["sessions"] = sessions
+    periods["days_below_sma"] = np.add.reduceat(below, starts)
+    return periods, np.add.reduceat(triggers, starts, axis=0) if len(triggers) else triggers
+
+
+class AggregationCube:
+    """Daily, weekly and monthly NIFTY summaries, maintained incrementally as bars arrive.
+
+    Each update only re-aggregates from the first changed day (and the week
+    and month containing it), and the whole cube is one uncompressed .npz of
+    fixed-width arrays, so a timeframe view loads in milliseconds however
+    long the history is.
+    """
+
+    def __init__(self, path, sma_window=20):
+        self.path = path
+        self.sma_window = sma_window
+        self.load()
+
+    def reset(self):
+        self.days = np.empty(0, dtype=DAY_DTYPE)
+        self.trigger_names = list(TRIGGER_TYPES)
+        self.triggers = {"D": np.zeros((0, len(self.trigger_names)), dtype=np.int32)}
+        self.periods = {}
+        for timeframe in ("W", "M"):
+            self.periods[timeframe], self.triggers[timeframe] = aggregate(self.days, self.triggers["D"], timeframe)
+        self.history_len = 0
+
+    def load(self):
+        self.reset()
+        if not os.path.exists(self.path):
+            return
+        with np.load(self.path) as data:
+            if int(data["sma_window"]) != self.sma_window:
+                return  # different SMA: rebuilt on the next update
+            self.days = data["D"]
+            self.trigger_names = data["trigger_names"].tolist()
+            self.history_len = int(data["history_len"])
+            for timeframe in ("W", "M"):
+                self.periods[timeframe] = data[timeframe]
+            for timeframe in TIMEFRAMES:
+                self.triggers[timeframe] = data[f"{timeframe}_triggers"]
+
+    def save(self):
+        with atomic_write(self.path, "wb") as f:
+            np.savez(f, D=self.days, W=self.periods["W"], M=self.periods["M"],
+                     D_triggers=self.triggers["D"], W_triggers=self.triggers["W"], M_triggers=self.triggers["M"],
+                     trigger_names=np.array(self.trigger_names), history_len=self.history_len,
+                     sma_window=self.sma_window)
+
+    def update(self, bars, vix_bars, history):
+        """Fold in NIFTY bars (BAR_DTYPE, oldest first), VIX bars and the investment history.
+
+        Bars from the last stored day on are re-read, since the latest bar may
+        have been revised. Bars before the first stored day (a backfill) rebuild
+        the cube and recount the history from the first bar. Investments are
+        counted once the bar of their day is in the cube. Returns True if
+        anything changed.
+        """
+        if len(self.days) and len(bars) and bars["date"][0] < self.days["date"][0]:
+            self.reset()
+        first = self.update_days(bars, vix_bars)
+        counted = self.update_triggers(history, first)
+        if first is None or (counted is not None and counted < first):
+            first = counted
+        if first is None:
+            return False
+
+        # Re-aggregate from the week/month containing the first changed day
+        for timeframe in ("W", "M"):
+            keys = period_keys(self.days["date"], timeframe)
+            row = int(np.searchsorted(keys, keys[first]))
+            periods, triggers = aggregate(self.days[row:], self.triggers["D"][row:], timeframe)
+            keep = int(np.searchsorted(self.periods[timeframe]["start"], self.days["date"][row]))
+            self.periods[timeframe] = np.concatenate([self.periods[timeframe][:keep], periods])
+            self.triggers[timeframe] = np.concatenate([self.triggers[timeframe][:keep], triggers])
+        self.save()
+        return True
+
+    def update_days(self, bars, vix_bars):
+        """Append/replace daily rows; returns the index of the first changed row or None"""
+        new = bars[bars["date"] >= self.days["date"][-1]] if len(self.days) else bars
+        if not len(new):
+            return None
+        first = int(np.searchsorted(self.days["date"], new["date"][0]))
+        fields = ("date", "open", "high", "low", "close", "volume")
+        if len(new) == 1 and first < len(self.days) and all(
+                np.array_equal(self.days[field][first:], new[field], equal_nan=True) for field in fields):
+            return None  # only the unchanged last bar
+
+        # The SMA of the new rows needs the window-1 closes before them
+        context = self.days["close"][max(0, first - self.sma_window + 1):first]
+        rows = np.empty(len(new), dtype=DAY_DTYPE)
+        for field in fields:
+            rows[field] = new[field]
+        rows["sma"] = rolling_sma(np.concatenate([context, rows["close"]]), self.sma_window)[len(context):]
+        rows["vix"] = np.nan
+        if len(vix_bars):
+            # Last VIX close on or before each day
+            i = np.searchsorted(vix_bars["date"], rows["date"], side="right") - 1
+            rows["vix"] = np.where(i >= 0, vix_bars["close"][np.maximum(i, 0)], np.nan)
+
+        self.days = np.concatenate([self.days[:first], rows])
+        self.triggers["D"] = np.concatenate([
+            self.triggers["D"][:first],
+            np.zeros((len(rows), len(self.trigger_names)), dtype=np.int32)
+        ])
+        return first
+
+    def update_triggers(self, history, first=None):
+        """Count investments whose day's bar is in the cube; returns the first changed row or None"""
+        if len(history) < self.history_len:
+            # History was replaced (e.g. a reset state): recount all of it
+            self.triggers["D"][:] = 0
+            self.history_len = 0
+        if not len(self.days):
+            return None
+
+        start = self.history_len
+        if first is not None:
+            # Rows from `first` on were rebuilt with zero counts; history is in date order,
+            # so the investments on them are the last ones counted
+            while start and np.datetime64(history[start - 1]['date'], "D").astype(np.int64) >= self.days["date"][first]:
+                start -= 1
+
+        changed = None
+        last_day = self.days["date"][-1]
+        for record in history[start:]:
+            day = np.datetime64(record['date'], "D").astype(np.int64)
+            if day > last_day:
+                break  # its bar has not arrived yet
+            start += 1
+            if day < self.days["date"][0]:
+                continue  # before the stored history
+            if record['trigger'] not in self.trigger_names:
+                self.trigger_names.append(record['trigger'])
+                for timeframe in TIMEFRAMES:
+                    counts = self.triggers[timeframe]
+                    self.triggers[timeframe] = np.hstack([counts, np.zeros((len(counts), 1), dtype=np.int32)])
+            # An investment on a non-session day counts towards the session before it
+            row = max(0, int(np.searchsorted(self.days["date"], day, side="right")) - 1)
+            self.triggers["D"][row, self.trigger_names.index(record['trigger'])] += 1
+            changed = row if changed is None else min(changed, row)
+        self.history_len = start
+        return changed
+
+    def view(self, timeframe="D", start=None):
+        """(rows, trigger counts) of one timeframe, optionally from a days-since-epoch start"""
+        rows = self.days if timeframe == "D" else self.periods[timeframe]
+        counts = self.triggers[timeframe]
+        if start is not None:
+            first = np.searchsorted(rows["date" if timeframe == "D" else "start"], start)
+            rows, counts = rows[first:], counts[first:]
+        return rows, counts
+
+    def frame(self, timeframe="D", start=None):
+        """A timeframe view as a date-indexed DataFrame with one column per trigger type"""
+        import pandas as pd
+        rows, counts = self.view(timeframe, start)
+        date_field = "date" if timeframe == "D" else "start"
+        frame = pd.DataFrame({name: rows[name] for name in rows.dtype.names if name not in (date_field, "end")},
+                             index=pd.DatetimeIndex(rows[date_field].astype("datetime64[D]"), name="Date"))
+        for i, name in enumerate(self.trigger_names):
+            frame[name] = counts[:, i]
+        return frame
+
+
+def update_cube(agent):
+    """Fold the agent's stored bars and investment history into its cube"""
+    cube = AggregationCube(os.path.join(agent.bar_store.root, "cube.npz"), agent.params['sma_window'])
+    cube.update(agent.bar_store.load(agent.nifty_symbol), agent.bar_store.load(agent.vix_symbol),
+                agent.state['investment_history'])
+    return cube
+
+
+if __name__ == "__main__":
+    import argparse
+    from nifty_agent import NiftyInvestmentAgent
+    parser = argparse.ArgumentParser(description="Backfill daily history and build the aggregation cube")
+    parser.add_argument("--start", default="2008-01-01")
+    args = parser.parse_args()
+    agent = NiftyInvestmentAgent()
+    agent.load_history(args.start)
+    cube = update_cube(agent)
+    for timeframe, label in TIMEFRAMES.items():
+        print(f"{label}: {len(cube.view(timeframe)[0])} rows")
@@ -2,21 +2,54 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from datetime import datetime
+import plotly.graph_objects as go
+import os
+import threading
+from datetime import datetime, timedelta, timezone
 from nifty_agent import NiftyInvestmentAgent
+from cube import AggregationCube, TIMEFRAMES
+
+IST = timezone(timedelta(hours=5, minutes=30))
+MARKET_DATA_TTL = 300  # seconds; quotes only move while the session is open
 
 st.set_page_config(page_title="Nifty 50 Investment Agent", layout="wide")
 
 st.title("Nifty 50 Investment Agent")
 st.markdown("Automated investing in ICICINIFTY50 based on market conditions")
 
-agent = NiftyInvestmentAgent()
+@st.cache_resource
+def get_agent():
+    """One agent (and its bar store, indicators and state store) shared by all sessions"""
+    return NiftyInvestmentAgent(), threading.Lock()
+
+def trading_session():
+    """Cache key for market data: the IST trading date"""
+    return datetime.now(IST).date().isoformat()
+
+@st.cache_data(ttl=MARKET_DATA_TTL, show_spinner=False)
+def load_market_data(session):
+    agent, lock = get_agent()
+    with lock:
+        return agent.fetch_market_data()
+
+@st.cache_data(show_spinner=False)
+def load_timeframe(path, timeframe, version, sma_window):
+    """One timeframe of the aggregation cube and its trigger columns; version (the file's mtime) invalidates it"""
+    cube = AggregationCube(path, sma_window)
+    return cube.frame(timeframe), cube.trigger_names
+
+agent, agent_lock = get_agent()
+with agent_lock:
+    # Cheap stat() check; the state is only re-read when another process wrote it
+    agent.refresh_state()
 
 # Sidebar for controls
 st.sidebar.header("Controls")
 if st.sidebar.button("Check Market Now"):
     with st.spinner("Checking market conditions..."):
-        result = agent.daily_check()
+        with agent_lock:
+            result = agent.daily_check()
+        load_market_data.clear()
         if result['action_taken']:
             st.sidebar.success("Investment executed!")
         else:
@@ -29,14 +62,15 @@ with col1:
     st.subheader("Investment Status")
     if agent.state['last_investment_date']:
         st.metric("Last Investment", agent.state['last_investment_date'])
+        # Derived from the calendar rather than the counter stored at the last check
         st.metric("Days Since Last Investment", 
-                 agent.state['trading_days_since_last_investment'])
+                 agent.trading_days_since_last_investment())
     else:
         st.info("No investments recorded yet")
 
 with col2:
     st.subheader("Current Triggers")
-    market_data = agent.fetch_market_data()
+    market_data = load_market_data(trading_session())
     triggers = agent.check_triggers(market_data)
     
     if triggers:
@@ -50,16 +84,46 @@ st.subheader("Market Data")
 df = pd.DataFrame([market_data])
 st.dataframe(df)
 
+# Multi-timeframe view from the precomputed cube (built by daily_check or cube.py)
+st.subheader("Market History")
+cube_path = os.path.join(agent.bar_store.root, "cube.npz")
+if os.path.exists(cube_path):
+    timeframe = st.radio("Timeframe", list(TIMEFRAMES), format_func=TIMEFRAMES.get, horizontal=True)
+    cube_df, trigger_columns = load_timeframe(cube_path, timeframe, os.stat(cube_path).st_mtime_ns, agent.params['sma_window'])
+    
+    fig = go.Figure([
+        go.Candlestick(x=cube_df.index, open=cube_df['open'], high=cube_df['high'],
+                       low=cube_df['low'], close=cube_df['close'], name="Nifty 50"),
+        go.Scatter(x=cube_df.index, y=cube_df['sma'], name=f"{agent.params['sma_window']}-Day SMA")
+    ])
+    fig.update_layout(xaxis_rangeslider_visible=False, title=f"Nifty 50 ({TIMEFRAMES[timeframe]})")
+    st.plotly_chart(fig)
+    
+    st.line_chart(cube_df['vix' if timeframe == "D" else 'vix_mean'].rename("India VIX"))
+    investments = cube_df[trigger_columns]
+    if investments.to_numpy().any():
+        st.bar_chart(investments[investments.sum(axis=1) > 0])
+else:
+    st.info("No aggregated market history yet (run a check or `python cube.py`)")
+
 # Investment history
 st.subheader("Investment History")
-if agent.state['investment_history']:
-    history_df = pd.DataFrame(agent.state['investment_history'])
+history_count = agent.store.history_count()
+if history_count:
+    # Page through history instead of loading all of it on every rerun
+    page_size = 50
+    pages = (history_count - 1) // page_size + 1
+    page = st.number_input("Page", min_value=1, max_value=pages, value=1) if pages > 1 else 1
+    history_df = pd.DataFrame(agent.store.history_page(limit=page_size, offset=(page - 1) * page_size))
     st.dataframe(history_df)
     
     # Visualize investment timing
     fig = px.scatter(history_df, x='date', y='trigger', color='trigger',
                     title="Investment History by Trigger Type")
     st.plotly_chart(fig)
+    
+    counts = pd.Series(agent.store.trigger_counts(), name="Investments")
+    st.bar_chart(counts)
 else:
     st.info("No investment history available")
 
@@ -0,0 +1,81 @@
+# indicators.py
+import numpy as np
+
+
+class RollingSMA:
+    """Simple moving average over the last `window` closes, updated in O(1) per bar"""
+
+    def __init__(self, window=20):
+        self.window = window
+        self.buffer = np.zeros(window)
+        self.count = 0  # closes held, capped at window
+        self.pos = 0  # ring slot the next close is written to
+        self.total = 0.0
+        self.last_date = None  # ISO date of the newest close
+
+    @property
+    def value(self):
+        """Current SMA, NaN until `window` closes have been seen (like pandas rolling)"""
+        return self.total / self.window if self.count == self.window else float("nan")
+
+    def update(self, close, bar_date=None):
+        """Add a close; repeating the newest bar_date replaces it instead (intraday tick)"""
+        close = float(close)
+        if self.count and bar_date is not None and bar_date == self.last_date:
+            self.replace_last(close)
+            return self.value
+
+        if self.count == self.window:
+            self.total -= self.buffer[self.pos]
+        else:
+            self.count += 1
+        self.buffer[self.pos] = close
+        self.total += close
+        self.pos = (self.pos + 1) % self.window
+        if self.pos == 0:
+            # Re-sum once per wrap so floating-point drift cannot accumulate
+            self.total = float(self.buffer[:self.count].sum())
+        self.last_date = bar_date
+        return self.value
+
+    def replace_last(self, close):
+        """Overwrite the newest close, e.g. with a fresher intraday price"""
+        last = (self.pos - 1) % self.window
+        self.total += float(close) - self.buffer[last]
+        self.buffer[last] = float(close)
+
+    def closes(self):
+        """Held closes, oldest first"""
+        if self.count < self.window:
+            return self.buffer[:self.count].copy()
+        return np.roll(self.buffer, -self.pos)
+
+    def to_dict(self):
+        return {
+            "window": self.window,
+            "closes": self.closes().tolist(),
+            "last_date": self.last_date
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sma = cls(data["window"])
+        for close in data["closes"]:
+            sma.update(close)
+        sma.last_date = data.get("last_date")
+        return sma
+
+
+def etf_premium(etf_closes, index_closes, window=20):
+    """Premium (%) of the latest ETF close over the index-implied fair value.
+
+    Closes are aligned by date, oldest first. The ETF tracks the index at a
+    near-constant ratio, so the fair value is the latest index close times
+    the median ETF/index ratio of the `window` sessions before it: slow
+    tracking drift and expense accrual are absorbed, a one-day dislocation
+    is not. NaN without at least one earlier session.
+    """
+    ratio = np.asarray(etf_closes, dtype=np.float64) / np.asarray(index_closes, dtype=np.float64)
+    if len(ratio) < 2:
+        return float("nan")
+    return float((ratio[-1] / np.nanmedian(ratio[-window - 1:-1]) - 1) * 100)
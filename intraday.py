@@ -0,0 +1,132 @@
+# intraday.py
+import os
+import threading
+import time
+from datetime import datetime, time as dtime, timedelta, timezone
+from nifty_agent import NiftyInvestmentAgent, load_env
+from trading_calendar import nse_calendar
+
+IST = timezone(timedelta(hours=5, minutes=30))
+MARKET_OPEN = dtime(9, 15)
+MARKET_CLOSE = dtime(15, 30)
+
+
+class Hysteresis:
+    """Latch that fires once when a value crosses its threshold.
+
+    It re-arms only after the value has moved `band` back past the
+    threshold, so a price hovering around the line does not fire on every
+    tick.
+    """
+
+    def __init__(self, band, below=False):
+        self.band = band
+        self.below = below  # fire when value <= threshold instead of > threshold
+        self.armed = True
+
+    def update(self, value, threshold):
+        if self.below:
+            crossed, retreated = value <= threshold, value > threshold + self.band
+        else:
+            crossed, retreated = value > threshold, value < threshold - self.band
+        if self.armed and crossed:
+            self.armed = False
+            return True
+        if not self.armed and retreated:
+            self.armed = True
+        return False
+
+
+class IntradayMonitor:
+    """Evaluates PRICE_DIP and VOLATILITY_SPIKE on every intraday tick.
+
+    The agent's streaming SMA treats today's latest price as today's bar, so
+    each tick is an O(1) float update with no DataFrame construction. At
+    most one investment is executed per day.
+    """
+
+    def __init__(self, agent=None, interval="1m", poll_seconds=60, dip_band=0.5, vix_band=1.0):
+        self.agent = agent or NiftyInvestmentAgent()
+        self.interval = interval
+        self.poll_seconds = poll_seconds
+        self.dip = Hysteresis(dip_band, below=True)  # band in percentage points
+        self.vix = Hysteresis(vix_band)
+        self.ticks = 0
+        self.last_eval_ms = None
+
+    def on_tick(self, nifty_price, vix, day):
+        """Evaluate one tick (day is the ISO trading date); returns the investment message if one ran"""
+        started = time.perf_counter()
+        agent = self.agent
+        params = agent.params
+
+        sma = agent.sma.update(nifty_price, day)
+        fired = set()
+        if sma == sma:  # NaN until the SMA has a full window
+            dip_pct = (nifty_price - sma) / sma * 100
+            if self.dip.update(dip_pct, params['dip_threshold']):
+                fired.add("PRICE_DIP")
+        if vix is not None and self.vix.update(vix, params['vix_level']):
+            fired.add("VOLATILITY_SPIKE")
+
+        result = None
+        if fired:
+            # The scheduler or dashboard may have invested today from another process
+            agent.refresh_state()
+        if fired and agent.state['last_investment_date'] != day:
+            market_data = {
+                "nifty_close": nifty_price,
+                "sma_20": sma,
+                "vix": vix,
+                "timestamp": agent.provider.now().isoformat()
+            }
+            # Custom rules may not define these triggers the same way; only act if they agree
+            trigger = next((t for t in agent.check_triggers(market_data) if t['type'] in fired), None)
+            if trigger is not None:
+                # The ETF is only quoted on the tick that would invest
+                market_data.update(agent.live_etf_quote(nifty_price, day, self.interval))
+                if agent.premium_delay(trigger, market_data) is None:
+                    result = agent.execute_investment(trigger, market_data)
+
+        self.ticks += 1
+        self.last_eval_ms = (time.perf_counter() - started) * 1000
+        return result
+
+    def poll(self):
+        """Fetch the latest NIFTY and VIX prices concurrently and evaluate them"""
+        pool = self.agent.executor()
+        nifty = pool.submit(self.agent.provider.latest, self.agent.nifty_symbol, self.interval)
+        vix = pool.submit(self.agent.provider.latest, self.agent.vix_symbol, self.interval)
+        nifty_price, vix_value = nifty.result(), vix.result()
+        if nifty_price is None:
+            return None
+        # Same clock execute_investment records dates with, so the once-a-day guard holds
+        return self.on_tick(nifty_price, vix_value, self.agent.provider.now().date().isoformat())
+
+    @staticmethod
+    def market_open(now=None):
+        now = now or datetime.now(IST)
+        return nse_calendar().is_session(now) and MARKET_OPEN <= now.time() <= MARKET_CLOSE
+
+    def run(self, stop=None):
+        """Poll every poll_seconds during market hours until stop is set"""
+        stop = stop or threading.Event()
+        # Bring the SMA up to yesterday's close before the first tick
+        self.agent.fetch_market_data()
+        while not stop.is_set():
+            if self.market_open():
+                try:
+                    result = self.poll()
+                    if result:
+                        print(result)
+                except Exception as e:
+                    print(f"Intraday check failed: {e}")
+            stop.wait(self.poll_seconds)
+
+
+if __name__ == "__main__":
+    load_env()
+    IntradayMonitor(
+        interval=os.getenv('NIFTY_INTRADAY_INTERVAL', "1m"),
+        poll_seconds=float(os.getenv('NIFTY_POLL_SECONDS', "60"))
+    ).run()
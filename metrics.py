@@ -0,0 +1,91 @@
+# metrics.py
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger("nifty_agent.metrics")
+if os.getenv('NIFTY_JSON_LOGS') == '1' and not logger.handlers:
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+class Metrics:
+    """Process-wide stage timers and counters.
+
+    Exposed as Prometheus text (render_prometheus) and, with
+    NIFTY_JSON_LOGS=1, as one JSON log line per observation.
+    """
+
+    def __init__(self, prefix="nifty"):
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.timers = {}  # stage -> {"count", "sum", "max", "last"} in seconds
+        self.counters = {}  # (name, labels) -> value
+
+    @contextmanager
+    def timer(self, stage):
+        """Time the enclosed block as one observation of stage"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started)
+
+    def observe(self, stage, seconds):
+        with self.lock:
+            stats = self.timers.setdefault(stage, {"count": 0, "sum": 0.0, "max": 0.0, "last": 0.0})
+            stats["count"] += 1
+            stats["sum"] += seconds
+            stats["max"] = max(stats["max"], seconds)
+            stats["last"] = seconds
+        logger.info(json.dumps({"ts": time.time(), "event": "stage", "stage": stage, "ms": round(seconds * 1000, 3)}))
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+        logger.info(json.dumps({"ts": time.time(), "event": "counter", "name": name, "amount": amount, **labels}))
+
+    def snapshot(self):
+        """Current values as plain data (for JSON status endpoints)"""
+        with self.lock:
+            return {
+                "timers": {stage: dict(stats) for stage, stats in self.timers.items()},
+                "counters": [{"name": name, "labels": dict(labels), "value": value}
+                             for (name, labels), value in self.counters.items()]
+            }
+
+    def render_prometheus(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        p = self.prefix
+        lines = []
+        with self.lock:
+            if self.timers:
+                lines += [f"# HELP {p}_stage_seconds Wall time of agent stages",
+                          f"# TYPE {p}_stage_seconds summary"]
+                for stage, stats in sorted(self.timers.items()):
+                    lines.append(f'{p}_stage_seconds_count{{stage="{stage}"}} {stats["count"]}')
+                    lines.append(f'{p}_stage_seconds_sum{{stage="{stage}"}} {stats["sum"]:.6f}')
+                lines += [f"# HELP {p}_stage_last_seconds Wall time of the latest run of each stage",
+                          f"# TYPE {p}_stage_last_seconds gauge"]
+                for stage, stats in sorted(self.timers.items()):
+                    lines.append(f'{p}_stage_last_seconds{{stage="{stage}"}} {stats["last"]:.6f}')
+
+            declared = set()
+            for (name, labels), value in sorted(self.counters.items()):
+                if name not in declared:
+                    lines.append(f"# TYPE {p}_{name}_total counter")
+                    declared.add(name)
+                label_text = ",".join(f'{key}="{val}"' for key, val in labels)
+                lines.append(f"{p}_{name}_total{{{label_text}}} {value}" if label_text else f"{p}_{name}_total {value}")
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Metrics()
@@ -0,0 +1,174 @@
+# montecarlo.py
+import argparse
+import numpy as np
+import pandas as pd
+from backtest import align_bars, DEFAULT_PARAMS
+from breadth import BREADTH_PARAMS
+from rules import load_rules
+
+SESSIONS_PER_MONTH = 21
+
+
+def block_bootstrap(returns, vix, n_paths, n_days, block=20, rng=None):
+    """Joint circular block bootstrap of daily index log returns and VIX levels.
+
+    Whole blocks of consecutive days are resampled, so volatility clusters
+    and the VIX/return relationship inside a block survive. Returns two
+    (n_paths, n_days) arrays.
+    """
+    rng = rng or np.random.default_rng()
+    n_blocks = -(-n_days // block)
+    starts = rng.integers(0, len(returns), (n_paths, n_blocks))
+    idx = ((starts[:, :, None] + np.arange(block)) % len(returns)).reshape(n_paths, -1)[:, :n_days]
+    return returns[idx], vix[idx]
+
+
+def rolling_sma_2d(closes, window):
+    """rolling_sma along the last axis of a 2-D array of paths"""
+    n_paths, n_days = closes.shape
+    csum = np.concatenate([np.zeros((n_paths, 1)), np.cumsum(closes, axis=1)], axis=1)
+    sma = np.full(closes.shape, np.nan)
+    if n_days >= window:
+        sma[:, window - 1:] = (csum[:, window:] - csum[:, :-window]) / window
+    return sma
+
+
+def signal_days(rules, closes, vix):
+    """Boolean (paths, days) mask of days any non-time rule fires, and the time rule's N"""
+    missing = np.full(closes.shape, np.nan)
+    env = {name: missing for name in ("days_since", "pct_below_sma", "advances", "declines", "new_lows", "new_lows_pct")}
+    env.update(close=closes, vix=vix)
+    for window in rules.sma_windows:
+        env[f"sma_{window}"] = rolling_sma_2d(closes, window)
+
+    signal = np.zeros(closes.shape, dtype=bool)
+    time_days = closes.shape[1] + 1
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for rule in rules:
+            if "days_since" not in rule.variables:
+                signal |= rule.evaluate(env)
+            elif rule.time_days is None:
+                raise ValueError(f"Rule {rule.name}: simulations only support days_since as 'days_since >= N'")
+            else:
+                time_days = min(time_days, max(rule.time_days, 1))
+    return signal, time_days
+
+
+def select_investments_2d(signal, time_days):
+    """Investment-day mask for every path at once (backtest.select_signal_days per row).
+
+    Each step advances every path to its next investment, so the loop runs
+    once per investment of the busiest path, not once per day.
+    """
+    n_paths, n_days = signal.shape
+    # Index of the next signal day at or after each day (n_days if none)
+    nxt = np.where(signal, np.arange(n_days), n_days)
+    nxt = np.minimum.accumulate(nxt[:, ::-1], axis=1)[:, ::-1]
+    nxt = np.concatenate([nxt, np.full((n_paths, 1), n_days)], axis=1)
+
+    invested = np.zeros(signal.shape, dtype=bool)
+    rows = np.arange(n_paths)
+    cur = nxt[:, 0]
+    active = cur < n_days
+    while active.any():
+        invested[rows[active], cur[active]] = True
+        after = nxt[rows, np.minimum(cur + 1, n_days)]
+        cur = np.where(active, np.minimum(after, cur + time_days), n_days)
+        active = cur < n_days
+    return invested
+
+
+def simulate_chunk(rules, closes, vix, contribution=1.0):
+    """Trigger strategy versus monthly SIP on a (paths, days) block of simulated closes.
+
+    Both receive `contribution` every SESSIONS_PER_MONTH sessions. SIP buys
+    on the day it arrives; the strategy holds it in cash until a trigger
+    invests everything accumulated (the month's allocation).
+    """
+    n_paths, n_days = closes.shape
+    signal, time_days = signal_days(rules, closes, vix)
+    invested = select_investments_2d(signal, time_days)
+
+    contributions = np.zeros(n_days)
+    contributions[::SESSIONS_PER_MONTH] = contribution
+    contributed = np.cumsum(contributions)
+    total = contributed[-1]
+
+    # Cumulative amount invested by each day; each investment buys all cash on hand
+    invested_cum = np.maximum.accumulate(np.where(invested, contributed, 0.0), axis=1)
+    bought = np.diff(invested_cum, axis=1, prepend=0.0)
+    units = (bought / closes).sum(axis=1)
+    final = closes[:, -1]
+    value = units * final + (total - invested_cum[:, -1])
+
+    sip_units = (contributions / closes).sum(axis=1)
+    sip_value = sip_units * final
+    with np.errstate(invalid="ignore", divide="ignore"):
+        avg_cost = invested_cum[:, -1] / units
+    sip_cost = total / sip_units
+
+    return pd.DataFrame({
+        "return_pct": (value / total - 1) * 100,
+        "sip_return_pct": (sip_value / total - 1) * 100,
+        "excess_return_pct": (value - sip_value) / total * 100,
+        "avg_cost_vs_sip_pct": (avg_cost / sip_cost - 1) * 100,  # negative: cheaper entries than SIP
+        "cash_days": (contributed - invested_cum).sum(axis=1) / total,  # days the average rupee waited
+        "investments": invested.sum(axis=1),
+        "index_return_pct": (final / closes[:, 0] - 1) * 100
+    })
+
+
+def run_montecarlo(closes, vix, n_paths=10000, years=10, block=20, chunk_paths=1000,
+                   rules=None, seed=None, **params):
+    """Simulate the trigger strategy over n_paths bootstrapped NIFTY/VIX paths.
+
+    Paths are generated and evaluated chunk_paths at a time, so memory is
+    bounded by the chunk rather than the number of paths. Returns one row
+    of metrics per path.
+    """
+    closes = np.asarray(closes, dtype=np.float64)
+    vix = np.asarray(vix, dtype=np.float64)
+    returns = np.diff(np.log(closes))
+    vix = vix[1:]
+    keep = ~np.isnan(returns) & ~np.isnan(vix)
+    returns, vix = returns[keep], vix[keep]
+
+    rules = rules or load_rules(params={**DEFAULT_PARAMS, **BREADTH_PARAMS, **params})
+    rng = np.random.default_rng(seed)
+    n_days = int(years * 252)
+    frames = []
+    for start in range(0, n_paths, chunk_paths):
+        n = min(chunk_paths, n_paths - start)
+        path_returns, path_vix = block_bootstrap(returns, vix, n, n_days, block, rng)
+        path_closes = closes[-1] * np.exp(np.cumsum(path_returns, axis=1))
+        frames.append(simulate_chunk(rules, path_closes, path_vix))
+    return pd.concat(frames, ignore_index=True)
+
+
+def summarize(results, percentiles=(5, 25, 50, 75, 95)):
+    """Percentiles of every metric across paths, plus how often the strategy beat SIP"""
+    summary = results.quantile([p / 100 for p in percentiles]).T
+    summary.columns = [f"p{p}" for p in percentiles]
+    summary["mean"] = results.mean()
+    summary.loc["beats_sip_pct", "mean"] = (results["excess_return_pct"] > 0).mean() * 100
+    return summary
+
+
+if __name__ == "__main__":
+    from nifty_agent import NiftyInvestmentAgent
+
+    parser = argparse.ArgumentParser(description="Monte Carlo of the trigger strategy versus monthly SIP")
+    parser.add_argument("--paths", type=int, default=10000)
+    parser.add_argument("--years", type=float, default=10)
+    parser.add_argument("--block", type=int, default=20, help="bootstrap block length in sessions")
+    parser.add_argument("--chunk", type=int, default=1000, help="paths simulated at a time")
+    parser.add_argument("--start", default="2008-01-01", help="history to resample from")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    agent = NiftyInvestmentAgent()
+    nifty_hist, vix_hist, _ = agent.load_history(args.start)
+    aligned = align_bars(nifty_hist, vix_hist)
+    results = run_montecarlo(aligned["closes"], aligned["vix"], args.paths, args.years, args.block,
+                             args.chunk, rules=agent.rules, seed=args.seed)
+    print(summarize(results).round(2).to_string())
@@ -1,35 +1,91 @@
 # nifty_agent.py
-import yfinance as yf
-import pandas as pd
-import numpy as np
-from datetime import datetime, timedelta
+# pandas, numpy, yfinance and twilio are imported on the code paths that use
+# them, so read-only CLI commands (status, history) start in milliseconds.
+from datetime import date
+import argparse
 import json
-import time
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
 import os
-from twilio.rest import Client
-from dotenv import load_dotenv
+from state_store import make_state_store
+from notifications import NotificationOutbox
+from metrics import METRICS
+from trading_calendar import nse_calendar
 
-load_dotenv()
+STATE_FILE = "investment_state.json"
+# Sessions of ETF/index history the premium's fair-value ratio is taken over
+PREMIUM_WINDOW = 20
+
+
+def load_env():
+    """Load .env into the environment"""
+    from dotenv import load_dotenv
+    load_dotenv()
+
+
+def open_state_store():
+    """The agent's state store, without constructing the agent"""
+    return make_state_store(os.getenv('NIFTY_STATE_BACKEND', 'json'), STATE_FILE)
 
 class NiftyInvestmentAgent:
-    def __init__(self):
+    def __init__(self, params=None, store=None, provider=None):
+        from bar_store import BarStore
+        from indicators import RollingSMA
+        from backtest import DEFAULT_PARAMS
+        from breadth import BreadthEngine, BREADTH_PARAMS
+        from providers import make_provider
+        from rules import load_rules
+        load_env()
+        
         self.nifty_symbol = "^NSEI"
         self.vix_symbol = "^INDIAVIX"
         self.icici_nifty_etf = "ICICINIFTY.NS"  # ICICI Prudential Nifty ETF
-        self.state_file = "investment_state.json"
+        self.state_file = STATE_FILE
+        self.store = store or open_state_store()
+        self.provider = provider or make_provider()
+        # Simulated or replayed bars get their own store so they never mix with live data
+        default_data_dir = 'market_data' if self.provider.name == 'yfinance' else os.path.join('market_data', self.provider.name)
+        self.bar_store = BarStore(os.getenv('NIFTY_DATA_DIR', default_data_dir))
+        # Constituent breadth costs 50 extra (delta) fetches per check, so it is opt-in
+        self.breadth = BreadthEngine(self.bar_store) if os.getenv('NIFTY_BREADTH') == '1' else None
+        self.params = {**DEFAULT_PARAMS, **BREADTH_PARAMS, **(params or {})}
+        # Trigger rules from NIFTY_RULES / triggers.ini, else the built-in ones
+        self.rules = load_rules(params=self.params)
         self.load_state()
         
+        # Streaming SMA; rebuilt from stored bars if the configured window changed
+        stored_sma = self.state.get('indicators', {}).get('sma_20')
+        if stored_sma and stored_sma['window'] == self.params['sma_window']:
+            self.sma = RollingSMA.from_dict(stored_sma)
+        else:
+            self.sma = RollingSMA(self.params['sma_window'])
+        
         # Twilio configuration
         self.twilio_account_sid = os.getenv('TWILIO_ACCOUNT_SID')
         self.twilio_auth_token = os.getenv('TWILIO_AUTH_TOKEN')
         self.twilio_phone = os.getenv('TWILIO_PHONE_NUMBER')
         self.user_phone = os.getenv('USER_PHONE_NUMBER')  # Indian mobile number
+        # Amount invested in the ETF whenever a trigger fires (the month's allocation)
+        self.monthly_allocation = float(os.getenv('NIFTY_MONTHLY_ALLOCATION', '10000'))
+        # Buying the ETF above this premium (%) to its fair value warns, or delays the
+        # investment for up to NIFTY_MAX_PREMIUM_DELAY_DAYS sessions
+        self.max_premium_pct = float(os.getenv('NIFTY_MAX_PREMIUM_PCT', '1.0'))
+        self.premium_action = os.getenv('NIFTY_PREMIUM_ACTION', 'delay')
+        if self.premium_action not in ('warn', 'delay'):
+            raise ValueError(f"NIFTY_PREMIUM_ACTION must be 'warn' or 'delay', not {self.premium_action!r}")
+        self.max_premium_delay = int(os.getenv('NIFTY_MAX_PREMIUM_DELAY_DAYS', '3'))
+        # iNAV is a separate quote request, so it is opt-in; without it the premium is estimated from the index
+        self.track_inav = os.getenv('NIFTY_INAV') == '1'
+        
+        # Reused between checks so a long-running process keeps its HTTP sessions warm
+        self.twilio = None
+        self.fetch_pool = None
+        self.outbox = NotificationOutbox(os.getenv('NIFTY_OUTBOX', 'notifications.db'), send=self.deliver_sms)
         
     def load_state(self):
-        try:
-            with open(self.state_file, 'r') as f:
-                self.state = json.load(f)
-        except FileNotFoundError:
+        self.state = self.store.load()
+        self.state_version = self.store.version()
+        if self.state is None:
             # Initialize state
             self.state = {
                 "last_investment_date": None,
@@ -37,111 +93,349 @@ class NiftyInvestmentAgent:
                 "investment_history": []
             }
             self.save_state()
+        if hasattr(self.state['investment_history'], 'rules'):
+            # Compact histories regenerate their messages with the agent's rules
+            self.state['investment_history'].rules = self.rules
     
     def save_state(self):
-        with open(self.state_file, 'w') as f:
-            json.dump(self.state, f, indent=4)
+        # Backends write only what changed since the last save
+        with METRICS.timer("state_save"):
+            self.store.save(self.state)
+        self.state_version = self.store.version()
+    
+    def refresh_state(self):
+        """Reload the state only if another process has written it since we last did"""
+        if self.store.version() != self.state_version:
+            self.load_state()
+    
+    def twilio_client(self):
+        """Twilio client, created on first use"""
+        if self.twilio is None:
+            from twilio.rest import Client
+            self.twilio = Client(self.twilio_account_sid, self.twilio_auth_token)
+        return self.twilio
+    
+    def executor(self):
+        """Thread pool for network fetches, created on first use"""
+        if self.fetch_pool is None:
+            self.fetch_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="fetch")
+        return self.fetch_pool
+    
+    def trading_days_since_last_investment(self, day=None):
+        """NSE sessions after the last investment up to day (default today); 0 before the first"""
+        last = self.state['last_investment_date']
+        if not last:
+            return 0
+        return nse_calendar().sessions_between(last, day or self.provider.now())
+    
+    def fetch_bars(self, lookbacks, optional=()):
+        """Refresh several symbols concurrently; lookbacks maps symbol -> bars to return.
+
+        Symbols in optional that cannot be fetched (and have no stored bars) map to None.
+        """
+        futures = {
+            symbol: self.executor().submit(self.bar_store.refresh, symbol, self.provider.fetcher(symbol),
+                                           period="1mo", lookback=lookback)
+            for symbol, lookback in lookbacks.items()
+        }
+        bars = {}
+        for symbol, future in futures.items():
+            try:
+                bars[symbol] = future.result()
+            except Exception as e:
+                if symbol not in optional:
+                    raise
+                print(f"Failed to fetch {symbol}: {e}")
+                bars[symbol] = None
+        return bars
+    
+    def fetch_inav(self):
+        """ETF iNAV from the provider, also kept in the bar store as <etf>.INAV; None if unavailable"""
+        import pandas as pd
+        try:
+            inav = self.provider.inav(self.icici_nifty_etf)
+        except Exception as e:
+            print(f"Failed to fetch iNAV of {self.icici_nifty_etf}: {e}")
+            return None
+        if inav:
+            day = pd.Timestamp(self.provider.now().date())
+            self.bar_store.write(f"{self.icici_nifty_etf}.INAV", pd.DataFrame({"Close": [inav]}, index=[day]))
+        return inav
     
     def fetch_market_data(self):
-        """Fetch current Nifty 50 and VIX data"""
-        nifty = yf.Ticker(self.nifty_symbol)
-        vix = yf.Ticker(self.vix_symbol)
+        """Fetch current Nifty 50, VIX and ETF data"""
+        # Read stored bars and fetch only the ones missing since the last run, all symbols at once
+        with METRICS.timer("data_fetch"):
+            inav = self.executor().submit(self.fetch_inav) if self.track_inav else None
+            bars = self.fetch_bars({
+                self.nifty_symbol: max(self.sma.window, *self.rules.sma_windows),
+                self.vix_symbol: 1,
+                self.icici_nifty_etf: PREMIUM_WINDOW + 1
+            }, optional=(self.icici_nifty_etf,))
+            inav = inav.result() if inav else None
+        nifty_hist = bars[self.nifty_symbol]
+        vix_data = bars[self.vix_symbol]
+        etf_hist = bars[self.icici_nifty_etf]
         
-        # Get historical data for SMA calculation
-        nifty_hist = nifty.history(period="1mo")
-        vix_data = vix.history(period="1d")
-        
-        # Calculate 20-day SMA
-        sma_20 = nifty_hist['Close'].rolling(window=20).mean().iloc[-1]
+        # Update the streaming SMA with the new bars only
+        with METRICS.timer("indicator_compute"):
+            self.update_indicators(nifty_hist)
+            sma_20 = self.sma.value
+            # Other windows the rules use are cheap means over the bars just read
+            closes = nifty_hist['Close'].to_numpy()
+            sma_values = {window: closes[-window:].mean() if len(closes) >= window else float('nan')
+                          for window in self.rules.sma_windows if window != self.sma.window}
         current_close = nifty_hist['Close'].iloc[-1]
         current_vix = vix_data['Close'].iloc[-1] if not vix_data.empty else None
         
-        return {
+        market_data = {
             "nifty_close": current_close,
             "sma_20": sma_20,
             "vix": current_vix,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": self.provider.now().isoformat()
         }
+        if sma_values:
+            market_data["sma"] = sma_values
+        if etf_hist is not None and not etf_hist.empty:
+            market_data.update(self.etf_quote(etf_hist, nifty_hist, inav))
+        if self.breadth is not None:
+            with METRICS.timer("breadth"):
+                market_data.update(self.fetch_breadth())
+        return market_data
+    
+    def fetch_breadth(self):
+        """Top up every constituent concurrently, then compute breadth in one matrix pass"""
+        futures = {
+            symbol: self.executor().submit(self.bar_store.update, symbol, self.provider.fetcher(symbol), period="1y")
+            for symbol in self.breadth.symbols
+        }
+        for symbol, future in futures.items():
+            try:
+                future.result()
+            except Exception as e:
+                print(f"Failed to fetch {symbol}: {e}")
+        return self.breadth.latest()
+    
+    def etf_quote(self, etf_hist, nifty_hist, inav=None):
+        """ETF close and its premium (%) to iNAV, or to the index-implied value without one"""
+        from indicators import etf_premium
+        price = float(etf_hist['Close'].iloc[-1])
+        quote = {"etf_price": price, "etf_premium_pct": None}
+        if inav:
+            quote["inav"] = inav
+            quote["etf_premium_pct"] = (price / inav - 1) * 100
+        elif etf_hist.index[-1] == nifty_hist.index[-1]:
+            # Only against the same day's index close; a missing ETF bar would compare stale prices
+            common = etf_hist.index.intersection(nifty_hist.index)
+            premium = etf_premium(etf_hist['Close'].reindex(common).to_numpy(),
+                                  nifty_hist['Close'].reindex(common).to_numpy(), PREMIUM_WINDOW)
+            quote["etf_premium_pct"] = None if premium != premium else premium
+        return quote
+    
+    def premium_warning(self, market_data):
+        """Warning text if the ETF trades above the allowed premium, else None"""
+        premium = (market_data or {}).get('etf_premium_pct')
+        if premium is None or premium <= self.max_premium_pct:
+            return None
+        basis = "iNAV" if market_data.get('inav') else "index-implied value"
+        return f"ICICINIFTY at {premium:.2f}% premium to {basis} (limit {self.max_premium_pct:.2f}%)"
+    
+    def delay_for_premium(self, day):
+        """Whether to postpone a triggered investment; never for more than max_premium_delay sessions"""
+        if self.premium_action != 'delay':
+            return False
+        since = self.state.get('premium_delay_since')
+        if since is None:
+            self.state['premium_delay_since'] = day
+            return True
+        return nse_calendar().sessions_between(since, day) < self.max_premium_delay
+    
+    def live_etf_quote(self, nifty_price, day, interval="1m"):
+        """etf_quote for an intraday NIFTY price: the ETF's latest price against the stored daily bars"""
+        import pandas as pd
+        from bar_store import bars_to_frame
+        try:
+            price = self.provider.latest(self.icici_nifty_etf, interval)
+        except Exception as e:
+            print(f"Failed to fetch {self.icici_nifty_etf}: {e}")
+            return {}
+        if price is None:
+            return {}
+        inav = self.fetch_inav() if self.track_inav else None
+        today = pd.Timestamp(day)
+        frames = []
+        for symbol, close in ((self.icici_nifty_etf, price), (self.nifty_symbol, nifty_price)):
+            bars = bars_to_frame(self.bar_store.load(symbol))
+            frames.append(pd.concat([bars[bars.index < today].tail(PREMIUM_WINDOW),
+                                     pd.DataFrame({"Close": [float(close)]}, index=pd.DatetimeIndex([today], name="Date"))]))
+        return self.etf_quote(*frames, inav)
+    
+    def premium_delay(self, trigger, market_data):
+        """Message if the trigger's investment is postponed for the ETF's premium, else None.
+
+        Prints the premium warning whenever there is one; the first delay also
+        sends an alert. Shared by the daily check and the intraday monitor.
+        """
+        warning = self.premium_warning(market_data)
+        if warning:
+            print(f"Warning: {warning}")
+        first_delay = self.state.get('premium_delay_since') is None
+        if trigger is not None and warning and self.delay_for_premium(self.provider.now().date().isoformat()):
+            message = f"Investment delayed: {warning}. {trigger['message']}"
+            if first_delay:
+                self.send_sms_alert(message)
+            self.save_state()
+            return message
+        # A delay only carries over between consecutive delayed checks
+        self.state['premium_delay_since'] = None
+        return None
+    
+    def update_indicators(self, nifty_hist):
+        """Feed bars newer than the SMA's last close into it and persist it with the state"""
+        dates = [day.date().isoformat() for day in nifty_hist.index]
+        closes = nifty_hist['Close'].to_numpy()
+        last = self.sma.last_date
+        
+        if last is None or not dates[0] <= last <= dates[-1]:
+            # No overlap with the stored indicator (first run or a long gap): rebuild it
+            self.sma = type(self.sma)(self.sma.window)
+            start = 0
+        else:
+            start = bisect_left(dates, last)
+        
+        for day, close in zip(dates[start:], closes[start:]):
+            self.sma.update(close, day)
+        
+        self.state['indicators'] = {"sma_20": self.sma.to_dict()}
     
     def check_triggers(self, market_data):
         """Check if any investment triggers are met"""
-        triggers = []
-        
-        # Trigger 1: Price Dip (≥2.5% below 20-Day SMA)
-        price_dip_percentage = (market_data['nifty_close'] - market_data['sma_20']) / market_data['sma_20'] * 100
-        if price_dip_percentage <= -2.5:
-            triggers.append({
-                "type": "PRICE_DIP",
-                "message": f"Nifty 50 closed {abs(price_dip_percentage):.2f}% below 20-Day SMA"
-            })
-        
-        # Trigger 2: Volatility Spike (VIX > 22)
-        if market_data['vix'] and market_data['vix'] > 22:
-            triggers.append({
-                "type": "VOLATILITY_SPIKE",
-                "message": f"India VIX closed at {market_data['vix']:.2f} (above 22)"
-            })
-        
-        # Trigger 3: Time-Based Safety Net (21 trading days since last investment)
-        if self.state['trading_days_since_last_investment'] >= 20:
-            triggers.append({
-                "type": "TIME_BASED",
-                "message": f"20 trading days have passed since last investment"
-            })
-        
-        return triggers
+        # Rules are evaluated in precedence order: PRICE_DIP, VOLATILITY_SPIKE,
+        # BREADTH_WEAK, NEW_LOWS and TIME_BASED unless configured otherwise
+        return self.rules.check(market_data, self.trading_days_since_last_investment(market_data.get('timestamp')))
+    
+    def load_history(self, start="2008-01-01"):
+        """Daily NIFTY, VIX and ETF history since start, backfilled into the bar store"""
+        return tuple(
+            self.bar_store.backfill(symbol, self.provider.fetcher(symbol), start)
+            for symbol in (self.nifty_symbol, self.vix_symbol, self.icici_nifty_etf)
+        )
+    
+    def backtest(self, start="2008-01-01", amount=1.0, **params):
+        """Replay the trigger rules over the stored daily history since start"""
+        from backtest import run_backtest
+        from rules import load_rules
+        nifty_hist, vix_hist, etf_hist = self.load_history(start)
+        # The live rules, recompiled if parameters are overridden for this run
+        rules = load_rules(params={**self.params, **params}) if params else self.rules
+        return run_backtest(nifty_hist, vix_hist, etf_hist, amount, rules=rules)
+    
+    def update_cube(self):
+        """Fold today's bars and investments into the multi-timeframe cube (never fails the check)"""
+        from cube import update_cube
+        try:
+            with METRICS.timer("cube_update"):
+                update_cube(self)
+        except Exception as e:
+            print(f"Failed to update aggregation cube: {e}")
     
     def send_sms_alert(self, message):
-        """Send SMS alert using Twilio"""
+        """Queue an SMS alert; the outbox worker delivers it without blocking the caller"""
         if all([self.twilio_account_sid, self.twilio_auth_token, self.twilio_phone, self.user_phone]):
-            try:
-                client = Client(self.twilio_account_sid, self.twilio_auth_token)
-                message = client.messages.create(
-                    body=message,
-                    from_=self.twilio_phone,
-                    to=self.user_phone
-                )
-                print(f"SMS sent: {message.sid}")
-            except Exception as e:
-                print(f"Failed to send SMS: {e}")
+            self.outbox.enqueue(message, self.user_phone)
         else:
             print("Twilio not configured. Message would be:", message)
     
-    def execute_investment(self, trigger):
+    def deliver_sms(self, body, to):
+        """Send one SMS using Twilio; raises on failure so the outbox retries it"""
+        try:
+            with METRICS.timer("alert_send"):
+                message = self.twilio_client().messages.create(
+                    body=body,
+                    from_=self.twilio_phone,
+                    to=to
+                )
+        except Exception:
+            METRICS.inc("sms_failures")
+            raise
+        METRICS.inc("sms_sent")
+        print(f"SMS sent: {message.sid}")
+        return message.sid
+    
+    def etf_price(self):
+        """Latest ETF close from the bar store (topped up first), or None if unavailable"""
+        try:
+            bars = self.bar_store.refresh(self.icici_nifty_etf, self.provider.fetcher(self.icici_nifty_etf), lookback=1)
+        except Exception as e:
+            print(f"Failed to fetch {self.icici_nifty_etf}: {e}")
+            return None
+        return float(bars['Close'].iloc[-1]) if not bars.empty else None
+    
+    def execute_investment(self, trigger, market_data=None):
         """Execute investment based on trigger"""
-        investment_date = datetime.now().date().isoformat()
+        from records import market_values
+        investment_date = self.provider.now().date().isoformat()
+        price = (market_data or {}).get('etf_price') or self.etf_price()
+        amount = self.monthly_allocation
         
-        # Record investment
+        # Record investment with its fill (price and units stay None if the ETF price is unknown)
+        # and the market values its message was formatted from
+        values = {}
+        if market_data:
+            values = market_values(market_data, self.trading_days_since_last_investment(market_data.get('timestamp')))
         self.state['last_investment_date'] = investment_date
         self.state['trading_days_since_last_investment'] = 0
+        self.state['premium_delay_since'] = None
         self.state['investment_history'].append({
             "date": investment_date,
             "trigger": trigger['type'],
-            "message": trigger['message']
+            "message": trigger['message'],
+            "price": price,
+            "units": amount / price if price else None,
+            "amount": amount,
+            **values
         })
         
         self.save_state()
         
         # Send confirmation
         alert_message = f"Investment triggered: {trigger['message']}. Executed 100% of month's allocation to ICICINIFTY."
+        warning = self.premium_warning(market_data)
+        if warning:
+            alert_message += f" Warning: {warning}."
         self.send_sms_alert(alert_message)
         
         return alert_message
     
+    @METRICS.timer("daily_check")
     def daily_check(self):
         """Perform daily market check"""
-        print(f"Checking market conditions at {datetime.now()}")
+        from rules import BREADTH_VARIABLES
+        print(f"Checking market conditions at {self.provider.now()}")
         
-        # Update trading days counter
-        if self.state['last_investment_date']:
-            self.state['trading_days_since_last_investment'] += 1
+        # Derived from dates, so weekends, holidays and repeated runs do not move it
+        self.state['trading_days_since_last_investment'] = self.trading_days_since_last_investment()
         
         market_data = self.fetch_market_data()
-        triggers = self.check_triggers(market_data)
+        with METRICS.timer("trigger_eval"):
+            triggers = self.check_triggers(market_data)
+        for trigger in triggers:
+            METRICS.inc("triggers_fired", trigger=trigger['type'])
+        
+        delayed = self.premium_delay(triggers[0] if triggers else None, market_data)
+        if delayed:
+            self.update_cube()
+            return {
+                "action_taken": False,
+                "message": delayed,
+                "market_data": market_data,
+                "trigger": triggers[0]
+            }
         
         if triggers:
             # Execute investment for the first trigger found
-            result = self.execute_investment(triggers[0])
+            result = self.execute_investment(triggers[0], market_data)
+            self.update_cube()
             return {
                 "action_taken": True,
                 "message": result,
@@ -150,19 +444,100 @@ class NiftyInvestmentAgent:
             }
         else:
             self.save_state()
+            self.update_cube()
             return {
                 "action_taken": False,
                 "message": "No triggers activated",
                 "market_data": market_data,
-                "triggers_checked": ["PRICE_DIP", "VOLATILITY_SPIKE", "TIME_BASED"]
+                "triggers_checked": [rule.name for rule in self.rules
+                                     if self.breadth is not None or not rule.variables & BREADTH_VARIABLES]
             }
 
 # For scheduled execution
 def run_daily_check():
     agent = NiftyInvestmentAgent()
-    return agent.daily_check()
+    result = agent.daily_check()
+    # A one-shot run must give queued alerts a chance to go out before exiting
+    agent.outbox.flush(timeout=30)
+    return result
+
+def read_status(store):
+    """Current trigger state straight from the state store"""
+    state = store.load() or {}
+    last = state.get('last_investment_date')
+    stored_sma = state.get('indicators', {}).get('sma_20') or {}
+    closes = stored_sma.get('closes', [])
+    history = store.history_page(limit=1)
+    status = {
+        "last_investment_date": last,
+        "trading_days_since_last_investment": nse_calendar().sessions_between(last, date.today()) if last else 0,
+        "market_open_today": nse_calendar().is_session(date.today()),
+        "investments": store.history_count(),
+        "last_trigger": history[0]['trigger'] if history else None,
+        "sma_window": stored_sma.get('window'),
+        "sma": sum(closes) / len(closes) if closes and len(closes) == stored_sma.get('window') else None,
+        "last_close_date": stored_sma.get('last_date')
+    }
+    outbox_path = os.getenv('NIFTY_OUTBOX', 'notifications.db')
+    if os.path.exists(outbox_path):
+        status["alerts_pending"] = NotificationOutbox(outbox_path).pending()
+    return status
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="nifty_agent", description="Nifty 50 investment agent")
+    commands = parser.add_subparsers(dest="command")
+    status = commands.add_parser("status", help="show the trigger state")
+    status.add_argument("--json", action="store_true")
+    commands.add_parser("check", help="run the daily market check (default)")
+    history = commands.add_parser("history", help="list recorded investments, newest first")
+    history.add_argument("--limit", type=int, default=20)
+    history.add_argument("--offset", type=int, default=0)
+    history.add_argument("--trigger", help="only investments made by this trigger")
+    history.add_argument("--json", action="store_true")
+    backtest = commands.add_parser("backtest", help="replay the trigger rules over stored daily history")
+    backtest.add_argument("--start", default="2008-01-01")
+    backtest.add_argument("--amount", type=float, default=1.0)
+    backtest.add_argument("--dip-threshold", type=float)
+    backtest.add_argument("--vix-level", type=float)
+    backtest.add_argument("--sma-window", type=int)
+    backtest.add_argument("--time-days", type=int)
+    args = parser.parse_args(argv)
+    load_env()
+    
+    # status and history only read the state store: no pandas, numpy or network
+    if args.command == "status":
+        result = read_status(open_state_store())
+        if args.json:
+            print(json.dumps(result))
+        else:
+            for key, value in result.items():
+                print(f"{key}: {value}")
+        return 0
+    
+    if args.command == "history":
+        records = open_state_store().history_page(limit=args.limit, offset=args.offset, trigger=args.trigger)
+        if args.json:
+            print(json.dumps(records))
+        else:
+            for record in records:
+                print(f"{record['date']}  {record['trigger']:17s} {record['message']}")
+        return 0
+    
+    if args.command == "backtest":
+        params = {key: getattr(args, key) for key in ("dip_threshold", "vix_level", "sma_window", "time_days")
+                  if getattr(args, key) is not None}
+        from backtest import investments_frame
+        result = NiftyInvestmentAgent().backtest(args.start, args.amount, **params)
+        print(investments_frame(result).tail(10).to_string(index=False))
+        print(f"investments: {len(result['index'])}")
+        print(f"invested: {result['invested']:.2f}")
+        print(f"portfolio_value: {result['portfolio_value']:.2f}")
+        print(f"return_pct: {result['return_pct']:.2f}")
+        return 0
+    
+    print(run_daily_check())
+    return 0
 
 if __name__ == "__main__":
-    # For testing
-    result = run_daily_check()
-    print(result)
\ No newline at end of file
+    raise SystemExit(main())
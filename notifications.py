@@ -0,0 +1,153 @@
+# notifications.py
+import hashlib
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+
+class NotificationOutbox:
+    """Persistent SMS outbox in SQLite, drained by a background worker thread.
+
+    enqueue() only writes a row, so callers never wait on the SMS provider.
+    The worker delivers through a single `send(body, to)` callable (which
+    returns a message id and raises on failure), retries with exponential
+    backoff and records the delivery status of every message. Identical
+    alerts to the same number on the same day are only queued once.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS outbox (
+            id INTEGER PRIMARY KEY,
+            dedupe_key TEXT NOT NULL UNIQUE,
+            recipient TEXT NOT NULL,
+            body TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL,
+            created_at TEXT NOT NULL,
+            sent_at TEXT,
+            sid TEXT,
+            last_error TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox (status, next_attempt_at);
+    """
+
+    def __init__(self, path="notifications.db", send=None, max_attempts=5, base_delay=2.0, max_delay=300.0):
+        self.path = path
+        self.send = send
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.local = threading.local()
+        self.wakeup = threading.Event()
+        self.stopping = threading.Event()
+        self.worker = None
+        self.connection().executescript(self.SCHEMA)
+
+    def connection(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self.local.conn = conn
+        return conn
+
+    def enqueue(self, body, to):
+        """Queue a message; returns its id, or None if an identical one was already queued today"""
+        day = datetime.now().date().isoformat()
+        dedupe_key = hashlib.sha256(f"{to}|{day}|{body}".encode()).hexdigest()
+        conn = self.connection()
+        with conn:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO outbox (dedupe_key, recipient, body, next_attempt_at, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (dedupe_key, to, body, time.time(), datetime.now().isoformat())
+            )
+        if not cursor.rowcount:
+            print("Duplicate alert suppressed:", body)
+            return None
+        self.start()
+        self.wakeup.set()
+        return cursor.lastrowid
+
+    def start(self):
+        """Start the delivery worker if it is not running"""
+        if self.worker is None or not self.worker.is_alive():
+            self.stopping.clear()
+            self.worker = threading.Thread(target=self.run, name="outbox", daemon=True)
+            self.worker.start()
+
+    def stop(self):
+        self.stopping.set()
+        self.wakeup.set()
+        if self.worker is not None:
+            self.worker.join()
+
+    def run(self):
+        while not self.stopping.is_set():
+            self.drain()
+            next_due = self.next_due()
+            timeout = 60.0 if next_due is None else max(0.0, next_due - time.time())
+            self.wakeup.wait(timeout)
+            self.wakeup.clear()
+
+    def drain(self):
+        """Attempt every message that is due; returns how many were attempted"""
+        conn = self.connection()
+        due = conn.execute(
+            "SELECT id, recipient, body, attempts FROM outbox "
+            "WHERE status = 'pending' AND next_attempt_at <= ? ORDER BY id",
+            (time.time(),)
+        ).fetchall()
+        for message_id, recipient, body, attempts in due:
+            try:
+                sid = self.send(body, recipient)
+            except Exception as e:
+                attempts += 1
+                status = "failed" if attempts >= self.max_attempts else "pending"
+                delay = min(self.base_delay * 2 ** (attempts - 1), self.max_delay)
+                print(f"Failed to send SMS (attempt {attempts}): {e}")
+                with conn:
+                    conn.execute(
+                        "UPDATE outbox SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                        (status, attempts, time.time() + delay, str(e), message_id)
+                    )
+            else:
+                with conn:
+                    conn.execute(
+                        "UPDATE outbox SET status = 'sent', attempts = ?, sent_at = ?, sid = ?, last_error = NULL "
+                        "WHERE id = ?",
+                        (attempts + 1, datetime.now().isoformat(), sid, message_id)
+                    )
+        return len(due)
+
+    def next_due(self):
+        row = self.connection().execute(
+            "SELECT MIN(next_attempt_at) FROM outbox WHERE status = 'pending'"
+        ).fetchone()
+        return row[0]
+
+    def pending(self):
+        return self.connection().execute("SELECT COUNT(*) FROM outbox WHERE status = 'pending'").fetchone()[0]
+
+    def flush(self, timeout=30.0):
+        """Wait up to timeout seconds for pending messages (e.g. before a one-shot run exits).
+
+        Returns the number still pending; they are retried on the next run.
+        """
+        deadline = time.time() + timeout
+        self.start()
+        self.wakeup.set()
+        while self.pending() and time.time() < deadline:
+            time.sleep(0.05)
+        return self.pending()
+
+    def recent(self, limit=20):
+        """Latest messages with their delivery status"""
+        rows = self.connection().execute(
+            "SELECT id, recipient, body, status, attempts, created_at, sent_at, sid, last_error "
+            "FROM outbox ORDER BY id DESC LIMIT ?", (limit,)
+        )
+        columns = [column[0] for column in rows.description]
+        return [dict(zip(columns, row)) for row in rows]
@@ -0,0 +1,268 @@
+# providers.py
+import os
+import re
+import zlib
+from datetime import datetime, time as dtime
+from functools import partial
+import numpy as np
+import pandas as pd
+from trading_calendar import nse_calendar
+
+PERIOD_PATTERN = re.compile(r"^(\d+)(d|wk|mo|y)$")
+
+
+class MarketDataProvider:
+    """Source of yfinance-shaped daily OHLCV frames (Open, High, Low, Close, Volume)"""
+
+    name = "provider"
+
+    def history(self, symbol, period=None, start=None, end=None, interval="1d"):
+        raise NotImplementedError
+
+    def fetcher(self, symbol):
+        """history() bound to symbol, in the shape BarStore expects"""
+        return partial(self.history, symbol)
+
+    def now(self):
+        """Current time as seen by the agent"""
+        return datetime.now()
+
+    def latest(self, symbol, interval="1m"):
+        """Most recent traded price of symbol at the given bar interval"""
+        frame = self.history(symbol, period="1d", interval=interval)
+        return float(frame['Close'].iloc[-1]) if not frame.empty else None
+
+    def inav(self, symbol):
+        """Published indicative NAV of an ETF, or None where the source has none"""
+        return None
+
+
+class YFinanceProvider(MarketDataProvider):
+    """Live Yahoo Finance data; Ticker objects are cached to keep HTTP sessions warm"""
+
+    name = "yfinance"
+
+    def __init__(self):
+        self.tickers = {}
+
+    def ticker(self, symbol):
+        import yfinance as yf
+        if symbol not in self.tickers:
+            self.tickers[symbol] = yf.Ticker(symbol)
+        return self.tickers[symbol]
+
+    def history(self, symbol, period=None, start=None, end=None, interval="1d"):
+        kwargs = {"period": period, "start": start, "end": end}
+        return self.ticker(symbol).history(interval=interval, **{k: v for k, v in kwargs.items() if v is not None})
+
+    def inav(self, symbol):
+        """NAV from the quote summary; Yahoo only reports it for some ETFs"""
+        nav = self.ticker(symbol).info.get("navPrice")
+        return float(nav) if nav else None
+
+
+class FrameProvider(MarketDataProvider):
+    """Serves in-memory frames as if the current date were `as_of` (replay clock)"""
+
+    def __init__(self, as_of=None, close_time=dtime(15, 0)):
+        self.frames = {}
+        self.as_of = pd.Timestamp(as_of).normalize() if as_of is not None else None
+        self.close_time = close_time
+
+    def frame(self, symbol):
+        """Full date-indexed frame for symbol"""
+        if symbol not in self.frames:
+            self.frames[symbol] = self.load(symbol)
+        return self.frames[symbol]
+
+    def load(self, symbol):
+        raise NotImplementedError
+
+    def dates(self, symbol):
+        """All bar dates for symbol, for stepping the replay clock"""
+        return self.frame(symbol).index
+
+    def set_date(self, as_of):
+        self.as_of = pd.Timestamp(as_of).normalize()
+
+    def now(self):
+        if self.as_of is None:
+            return datetime.now()
+        return datetime.combine(self.as_of.date(), self.close_time)
+
+    def latest(self, symbol, interval="1m"):
+        """Daily close on the replay date; recorded and simulated data have no intraday bars"""
+        frame = self.history(symbol)
+        return float(frame['Close'].iloc[-1]) if not frame.empty else None
+
+    def history(self, symbol, period=None, start=None, end=None, interval="1d"):
+        if interval != "1d":
+            raise NotImplementedError(f"{type(self).__name__} only serves daily bars")
+        frame = self.frame(symbol)
+        if self.as_of is not None:
+            frame = frame[frame.index <= self.as_of]
+        if start is not None:
+            frame = frame[frame.index >= pd.Timestamp(start)]
+        if end is not None:
+            frame = frame[frame.index < pd.Timestamp(end)]
+        if period is not None and period != "max" and not frame.empty:
+            frame = frame[frame.index > frame.index[-1] - period_offset(period)]
+        return frame
+
+
+def period_offset(period):
+    """yfinance period string ("5d", "1mo", "1y", ...) as a DateOffset"""
+    match = PERIOD_PATTERN.match(period)
+    if not match:
+        raise ValueError(f"Unsupported period: {period}")
+    count, unit = int(match.group(1)), match.group(2)
+    return {
+        "d": pd.DateOffset(days=count),
+        "wk": pd.DateOffset(weeks=count),
+        "mo": pd.DateOffset(months=count),
+        "y": pd.DateOffset(years=count)
+    }[unit]
+
+
+def session_dates(index):
+    """Calendar date of each bar in its own timezone (yfinance stamps NSE bars at IST midnight)"""
+    try:
+        index = pd.to_datetime(index)
+    except (ValueError, TypeError):
+        index = pd.to_datetime(index, utc=True)  # mixed UTC offsets
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return index.date
+
+
+class ReplayProvider(FrameProvider):
+    """Recorded bars from <directory>/<symbol>.csv or .parquet, replayed as of a movable date"""
+
+    name = "replay"
+
+    def __init__(self, directory, as_of=None):
+        super().__init__(as_of)
+        self.directory = directory
+
+    def load(self, symbol):
+        stem = os.path.join(self.directory, symbol.replace("^", "_"))
+        if os.path.exists(stem + ".parquet"):
+            frame = pd.read_parquet(stem + ".parquet")
+        else:
+            frame = pd.read_csv(stem + ".csv", index_col=0)
+        frame.index = pd.DatetimeIndex(session_dates(frame.index), name="Date")
+        return frame.sort_index()
+
+    @staticmethod
+    def record(frame, directory, symbol):
+        """Save a yfinance history frame where ReplayProvider will find it"""
+        os.makedirs(directory, exist_ok=True)
+        frame.to_csv(os.path.join(directory, symbol.replace("^", "_") + ".csv"))
+        loaded = ReplayProvider(directory).load(symbol).index
+        if list(loaded) != sorted(pd.DatetimeIndex(session_dates(frame.index))):
+            raise ValueError(f"Recorded {symbol} bars do not load back on their own dates")
+
+
+class SyntheticProvider(FrameProvider):
+    """Deterministic simulated markets of any length.
+
+    The index follows geometric Brownian motion with Poisson jumps (Merton
+    jump-diffusion). India VIX is a mean-reverting log process that rises
+    when the index falls, and ETFs/stocks track the index with their own
+    noise. Every symbol's path depends only on the seed and the symbol.
+    """
+
+    name = "synthetic"
+
+    def __init__(self, n_days=2520, seed=0, end=None, as_of=None,
+                 mu=0.11, sigma=0.16, jump_rate=3.0, jump_mean=-0.03, jump_std=0.04):
+        super().__init__(as_of)
+        self.n_days = n_days
+        self.seed = seed
+        end = pd.Timestamp(end) if end is not None else pd.Timestamp.today()
+        # NSE sessions, so replays count trading days the way the live agent does
+        self.index = pd.DatetimeIndex(nse_calendar().last_sessions(end.date(), n_days), name="Date").as_unit("us")
+        self.mu, self.sigma = mu, sigma
+        self.jump_rate, self.jump_mean, self.jump_std = jump_rate, jump_mean, jump_std
+
+    def rng(self, symbol):
+        return np.random.default_rng([self.seed, zlib.crc32(symbol.encode())])
+
+    def index_returns(self):
+        """Daily log returns of the index path (shared by every symbol)"""
+        if "_returns" not in self.frames:
+            rng = self.rng("^NSEI")
+            dt = 1 / 252
+            diffusion = (self.mu - self.sigma ** 2 / 2) * dt + self.sigma * np.sqrt(dt) * rng.standard_normal(self.n_days)
+            jumps = rng.poisson(self.jump_rate * dt, self.n_days)
+            jump_sizes = jumps * self.jump_mean + np.sqrt(jumps) * self.jump_std * rng.standard_normal(self.n_days)
+            self.frames["_returns"] = diffusion + jump_sizes
+        return self.frames["_returns"]
+
+    def load(self, symbol):
+        returns = self.index_returns()
+        rng = self.rng(symbol)
+        if symbol == "^NSEI":
+            closes = 10000 * np.exp(np.cumsum(returns))
+        elif symbol == "^INDIAVIX":
+            # Log-OU around ln(15), pushed up by index drawdowns
+            log_vix = np.empty(self.n_days)
+            level = np.log(15.0)
+            shocks = rng.standard_normal(self.n_days) * 0.05 - returns * 4.0
+            for i in range(self.n_days):
+                level += 0.05 * (np.log(15.0) - level) + shocks[i]
+                log_vix[i] = level
+            closes = np.exp(log_vix)
+        else:
+            beta = rng.uniform(0.6, 1.4) if symbol.endswith(".NS") and "NIFTY" not in symbol else 1.0
+            noise = rng.standard_normal(self.n_days) * (0.012 if beta != 1.0 else 0.001)
+            closes = rng.uniform(100, 3000) * np.exp(np.cumsum(beta * returns + noise))
+
+        spread = np.abs(rng.standard_normal(self.n_days)) * 0.005
+        opens = closes * np.exp(rng.standard_normal(self.n_days) * 0.003)
+        return pd.DataFrame({
+            "Open": opens,
+            "High": np.maximum(opens, closes) * (1 + spread),
+            "Low": np.minimum(opens, closes) * (1 - spread),
+            "Close": closes,
+            "Volume": rng.integers(100000, 1000000, self.n_days).astype(np.float64)
+        }, index=self.index)
+
+
+def make_provider(spec=None):
+    """Provider from a spec string: yfinance, replay:<dir> or synthetic[:seed]"""
+    spec = spec or os.getenv('NIFTY_PROVIDER', "yfinance")
+    kind, _, arg = spec.partition(":")
+    if kind == "yfinance":
+        return YFinanceProvider()
+    if kind == "replay":
+        return ReplayProvider(arg or "recorded_bars")
+    if kind == "synthetic":
+        return SyntheticProvider(seed=int(arg or 0))
+    raise ValueError(f"Unknown market data provider: {spec}")
+
+
+def replay(agent, start=None, end=None):
+    """Run agent.daily_check once per recorded trading day between start and end.
+
+    The agent must be built on a FrameProvider and an empty bar store
+    directory, since stored bars from later dates would leak into the past,
+    and on a state store of its own. SMS alerts are not sent.
+    """
+    provider = agent.provider
+    dates = provider.dates(agent.nifty_symbol)
+    if start is not None:
+        dates = dates[dates >= pd.Timestamp(start)]
+    if end is not None:
+        dates = dates[dates <= pd.Timestamp(end)]
+
+    # Replayed investments must never text anyone: alerts fall back to being printed
+    user_phone, agent.user_phone = agent.user_phone, None
+    results = []
+    try:
+        for day in dates:
+            provider.set_date(day)
+            results.append(agent.daily_check())
+    finally:
+        agent.user_phone = user_phone
+    return results
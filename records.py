@@ -0,0 +1,251 @@
+# records.py
+import json
+from datetime import date
+import numpy as np
+from atomic_io import atomic_write
+
+# Position in this list is the trigger's code; append new types to keep codes stable
+TRIGGER_TYPES = ["PRICE_DIP", "VOLATILITY_SPIKE", "TIME_BASED", "BREADTH_WEAK", "NEW_LOWS"]
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+NO_FORMAT = np.iinfo(np.uint16).max  # format of a record whose message is kept verbatim
+
+# One fixed-width row per investment: the date as days since the epoch, the
+# trigger as an index into the array's trigger names, the message format as
+# an index into its formats, and the fill plus the market values the message
+# was formatted from (NaN where unknown)
+RECORD_DTYPE = np.dtype([
+    ("date", "<i4"),
+    ("trigger", "u1"),
+    ("format", "<u2"),
+    ("price", "<f8"),
+    ("units", "<f8"),
+    ("amount", "<f8"),
+    ("close", "<f8"),
+    ("sma", "<f8"),
+    ("vix", "<f8"),
+    ("days_since", "<f8"),
+    ("pct_below_sma", "<f8"),
+    ("advances", "<f8"),
+    ("declines", "<f8"),
+    ("new_lows", "<f8"),
+    ("new_lows_pct", "<f8"),
+])
+NUMERIC_FIELDS = RECORD_DTYPE.names[3:]
+VALUE_FIELDS = NUMERIC_FIELDS[3:]
+COUNT_FIELDS = ("days_since", "advances", "declines", "new_lows")
+
+_default_rules = None
+
+
+def default_rules():
+    """The agent's rules with default parameters, compiled on first use"""
+    global _default_rules
+    if _default_rules is None:
+        from backtest import DEFAULT_PARAMS
+        from breadth import BREADTH_PARAMS
+        from rules import load_rules
+        _default_rules = load_rules(params={**DEFAULT_PARAMS, **BREADTH_PARAMS})
+    return _default_rules
+
+
+def market_values(market_data, days_since):
+    """The VALUE_FIELDS of a day's market_data, as execute_investment records them"""
+    values = {
+        "close": market_data.get('nifty_close'),
+        "sma": market_data.get('sma_20'),
+        "vix": market_data.get('vix'),
+        "days_since": days_since
+    }
+    values.update({field: market_data[field] for field in VALUE_FIELDS if market_data.get(field) is not None})
+    return {field: None if value is None else float(value) for field, value in values.items()}
+
+
+def number(field, value):
+    """A record's value as decode() returns it: None if unknown, int for counts"""
+    if value is None or value != value:
+        return None
+    return int(value) if field in COUNT_FIELDS else float(value)
+
+
+def render(template, params, numbers):
+    """Message of a rule template for a record's numbers, as RuleSet.format_message
+    builds it from the same values; None if the template needs anything else"""
+    close, sma = numbers["close"], numbers["sma"]
+    values = {**params, **{field: numbers[field] for field in VALUE_FIELDS if numbers[field] is not None},
+              "nifty_close": close, "sma_20": sma}
+    if close is not None and sma:
+        values.update({f"sma_{params.get('sma_window')}": sma, "sma": sma,
+                       "below_sma_pct": (sma - close) / sma * 100})
+    try:
+        return template.format_map(values)
+    except (KeyError, ValueError, TypeError, IndexError, AttributeError):
+        return None
+
+
+def plain(params):
+    """params with NumPy scalars as Python numbers, so they can be saved as JSON"""
+    return {name: value.item() if isinstance(value, np.generic) else value for name, value in params.items()}
+
+
+class RecordArray:
+    """investment_history held as a RECORD_DTYPE array, decoded to dicts on access.
+
+    Supports what the agent does with the list of dicts the other backends
+    load (len, indexing, slicing, iteration, append). A message is stored as
+    its rule's template and the parameters it fired with, shared by every
+    record of that rule, and formatted again from the record's values when
+    it is read. Messages that would not come out exactly the same (rules
+    using values that are not recorded, records without values) are kept
+    verbatim.
+    """
+
+    def __init__(self, records=None, trigger_names=None, messages=None, formats=None, rules=None):
+        self.records = records if records is not None else np.empty(0, dtype=RECORD_DTYPE)
+        self.trigger_names = list(trigger_names if trigger_names is not None else TRIGGER_TYPES)
+        self.messages = dict(messages or {})  # row -> message kept verbatim
+        self.formats = [tuple(fmt) for fmt in formats or []]  # (template, params) per format code
+        self.format_codes = {(template, json.dumps(params, sort_keys=True)): code
+                             for code, (template, params) in enumerate(self.formats)}
+        self.rules = rules  # rules new records were triggered by, instead of default_rules()
+        self.rule_formats = (None, {})  # rules -> {trigger: (template, params)}
+        self.pending = []  # encoded rows appended since the array was last consolidated
+
+    @classmethod
+    def from_records(cls, history, rules=None):
+        array = cls(rules=rules)
+        array.extend(history)
+        return array
+
+    @classmethod
+    def load(cls, path, header, rules=None):
+        """Memory-map the rows saved at path; None if they do not match the header saved with them"""
+        records = np.load(path, mmap_mode="r")
+        if len(records) != header["rows"]:
+            return None
+        return cls(records, header["trigger_names"],
+                   {int(row): message for row, message in header["messages"].items()},
+                   header["formats"], rules)
+
+    def save(self, path):
+        """Write the rows to a .npy atomically; returns the header load() needs with them"""
+        with atomic_write(path, "wb") as f:
+            np.save(f, self.array)
+        return {"rows": len(self), "trigger_names": self.trigger_names,
+                "formats": [list(fmt) for fmt in self.formats],
+                "messages": {str(row): message for row, message in sorted(self.messages.items())}}
+
+    @property
+    def array(self):
+        """All rows as one RECORD_DTYPE array"""
+        if self.pending:
+            self.records = np.concatenate([self.records, np.array(self.pending, dtype=RECORD_DTYPE)])
+            self.pending = []
+        return self.records
+
+    def __len__(self):
+        return len(self.records) + len(self.pending)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.decode(row) for row in range(*i.indices(len(self)))]
+        row = i + len(self) if i < 0 else i
+        if not 0 <= row < len(self):
+            raise IndexError("record index out of range")
+        return self.decode(row)
+
+    def __iter__(self):
+        return (self.decode(row) for row in range(len(self)))
+
+    def append(self, record):
+        trigger = record['trigger']
+        if trigger not in self.trigger_names:
+            if len(self.trigger_names) > np.iinfo(np.uint8).max:
+                raise ValueError(f"Too many trigger types to encode {trigger!r} in one byte")
+            self.trigger_names.append(trigger)
+        numbers = {field: number(field, record.get(field)) for field in NUMERIC_FIELDS}
+        code = self.format_code(trigger, record.get('message'), numbers)
+        if code == NO_FORMAT and record.get('message'):
+            self.messages[len(self)] = record['message']
+        day = date.fromisoformat(record['date'][:10]).toordinal() - EPOCH_ORDINAL
+        self.pending.append((day, self.trigger_names.index(trigger), code,
+                             *(np.nan if numbers[field] is None else numbers[field] for field in NUMERIC_FIELDS)))
+
+    def extend(self, records):
+        for record in records:
+            self.append(record)
+
+    def format_code(self, trigger, message, numbers):
+        """Code of the format that reproduces message from numbers, or NO_FORMAT"""
+        if not message or numbers["close"] is None:
+            return NO_FORMAT
+        template, params = self.rule_format(trigger)
+        if template is None or render(template, params, numbers) != message:
+            return NO_FORMAT
+        key = (template, json.dumps(params, sort_keys=True))
+        if key not in self.format_codes:
+            if len(self.formats) >= NO_FORMAT:
+                return NO_FORMAT
+            self.format_codes[key] = len(self.formats)
+            self.formats.append((template, params))
+        return self.format_codes[key]
+
+    def rule_format(self, trigger):
+        """(message template, params) of the rule for trigger; (None, None) if there is none"""
+        rules = self.rules or default_rules()
+        if self.rule_formats[0] is not rules:
+            self.rule_formats = (rules, {rule.name: (rule.message, plain(rules.params)) for rule in rules})
+        return self.rule_formats[1].get(trigger, (None, None))
+
+    def decode(self, row):
+        """Record `row` as the dict execute_investment appended"""
+        if row < len(self.records):
+            values = self.records[row]
+        else:
+            # Appended since the last consolidation: decode it without concatenating every row
+            values = np.array(self.pending[row - len(self.records)], dtype=RECORD_DTYPE)
+        trigger = self.trigger_names[int(values["trigger"])]
+        numbers = {field: number(field, float(values[field])) for field in NUMERIC_FIELDS}
+        record = {
+            "date": date.fromordinal(EPOCH_ORDINAL + int(values["date"])).isoformat(),
+            "trigger": trigger,
+            "message": self.message(row, trigger, int(values["format"]), numbers),
+            "price": numbers["price"],
+            "units": numbers["units"],
+            "amount": numbers["amount"]
+        }
+        record.update({field: numbers[field] for field in VALUE_FIELDS if numbers[field] is not None})
+        return record
+
+    def message(self, row, trigger, code, numbers):
+        """The record's message, verbatim or formatted again from its values"""
+        if row in self.messages:
+            return self.messages[row]
+        if code != NO_FORMAT:
+            template, params = self.formats[code]
+            return render(template, params, numbers) or template
+        return f"{trigger} trigger"
+
+    # Queries answered from the arrays, decoding only the records returned
+    def page(self, limit=50, offset=0, trigger=None):
+        """Records newest first (latest appended first within a day), optionally of one trigger"""
+        records = self.array
+        rows = np.arange(len(records))
+        if trigger is not None:
+            if trigger not in self.trigger_names:
+                return []
+            rows = rows[records["trigger"] == self.trigger_names.index(trigger)]
+        order = rows[np.lexsort((rows, records["date"][rows]))[::-1]]
+        return [self.decode(int(row)) for row in order[offset:offset + limit]]
+
+    def count(self, trigger=None):
+        if trigger is None:
+            return len(self)
+        if trigger not in self.trigger_names:
+            return 0
+        return int(np.count_nonzero(self.array["trigger"] == self.trigger_names.index(trigger)))
+
+    def counts(self):
+        """Number of investments per trigger type"""
+        counts = np.bincount(self.array["trigger"], minlength=len(self.trigger_names))
+        return {name: int(n) for name, n in zip(self.trigger_names, counts) if n}
@@ -0,0 +1,272 @@
+# rules.py
+# Trigger rules are boolean expressions over the day's market values, e.g.
+# `close < sma(20) * 0.975 or vix > 22`, declared in an ini file (one section
+# per trigger, in precedence order) or YAML. See triggers.example.ini.
+import ast
+import configparser
+import os
+import numpy as np
+from backtest import rolling_sma, select_signal_days, fill_investments
+
+VARIABLES = {"close", "vix", "days_since", "pct_below_sma", "advances", "declines", "new_lows", "new_lows_pct"}
+BREADTH_VARIABLES = {"pct_below_sma", "advances", "declines", "new_lows", "new_lows_pct"}
+FUNCTIONS = {"abs": np.abs, "min": np.minimum, "max": np.maximum}
+EVAL_GLOBALS = {"__builtins__": {}, "_and": np.logical_and, "_or": np.logical_or, "_not": np.logical_not,
+                **{f"_{name}": func for name, func in FUNCTIONS.items()}}
+
+# The built-in triggers of check_triggers, in its precedence order
+DEFAULT_RULES = [
+    ("PRICE_DIP", "(close - sma({sma_window})) / sma({sma_window}) * 100 <= {dip_threshold}",
+     "Nifty 50 closed {below_sma_pct:.2f}% below {sma_window}-Day SMA"),
+    ("VOLATILITY_SPIKE", "vix > {vix_level}",
+     "India VIX closed at {vix:.2f} (above {vix_level:g})"),
+    ("BREADTH_WEAK", "pct_below_sma >= {breadth_below_sma_pct}",
+     "{pct_below_sma:.0f}% of Nifty 50 stocks closed below their 20-Day SMA"),
+    ("NEW_LOWS", "new_lows_pct >= {new_lows_pct}",
+     "{new_lows} Nifty 50 stocks closed at 52-week lows"),
+    ("TIME_BASED", "days_since >= {time_days}",
+     "{time_days} trading days have passed since last investment")
+]
+
+ALLOWED_NODES = (
+    ast.Expression, ast.BoolOp, ast.And, ast.Or, ast.UnaryOp, ast.Not, ast.USub, ast.UAdd,
+    ast.BinOp, ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Compare, ast.Lt, ast.LtE, ast.Gt, ast.GtE,
+    ast.Eq, ast.NotEq, ast.Name, ast.Load, ast.Constant, ast.Call
+)
+
+
+class RuleCompiler(ast.NodeTransformer):
+    """Rewrites a validated rule into an expression NumPy can evaluate elementwise.
+
+    and/or/not and chained comparisons become logical_and/or/not calls, and
+    sma(n) becomes the variable sma_n, so evaluation is a single eval().
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.variables = set()
+        self.windows = set()
+
+    def fail(self, message):
+        raise ValueError(f"Rule {self.name}: {message}")
+
+    def visit(self, node):
+        if not isinstance(node, ALLOWED_NODES):
+            self.fail(f"{type(node).__name__} is not allowed")
+        return super().visit(node)
+
+    def visit_Constant(self, node):
+        if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+            self.fail(f"only numeric constants are allowed, got {node.value!r}")
+        return node
+
+    def visit_Name(self, node):
+        if node.id not in VARIABLES:
+            self.fail(f"unknown variable {node.id!r} (known: {', '.join(sorted(VARIABLES))})")
+        self.variables.add(node.id)
+        return node
+
+    def visit_Call(self, node):
+        func = node.func.id if isinstance(node.func, ast.Name) else None
+        if node.keywords:
+            self.fail("keyword arguments are not allowed")
+        if func == "sma":
+            if len(node.args) != 1 or not isinstance(node.args[0], ast.Constant) \
+                    or not isinstance(node.args[0].value, int) or node.args[0].value < 1:
+                self.fail("sma() takes one positive integer window")
+            self.windows.add(node.args[0].value)
+            return ast.Name(id=f"sma_{node.args[0].value}", ctx=ast.Load())
+        if func not in FUNCTIONS:
+            self.fail(f"unknown function {func!r} (known: sma, {', '.join(FUNCTIONS)})")
+        node.func = ast.Name(id=f"_{func}", ctx=ast.Load())
+        node.args = [self.visit(arg) for arg in node.args]
+        return node
+
+    def visit_BoolOp(self, node):
+        func = "_and" if isinstance(node.op, ast.And) else "_or"
+        values = [self.visit(value) for value in node.values]
+        result = values[0]
+        for value in values[1:]:
+            result = ast.Call(func=ast.Name(id=func, ctx=ast.Load()), args=[result, value], keywords=[])
+        return result
+
+    def visit_UnaryOp(self, node):
+        operand = self.visit(node.operand)
+        if isinstance(node.op, ast.Not):
+            return ast.Call(func=ast.Name(id="_not", ctx=ast.Load()), args=[operand], keywords=[])
+        node.operand = operand
+        return node
+
+    def visit_Compare(self, node):
+        operands = [self.visit(node.left)] + [self.visit(c) for c in node.comparators]
+        parts = [ast.Compare(left=left, ops=[op], comparators=[right])
+                 for left, op, right in zip(operands, node.ops, operands[1:])]
+        result = parts[0]
+        for part in parts[1:]:
+            result = ast.Call(func=ast.Name(id="_and", ctx=ast.Load()), args=[result, part], keywords=[])
+        return result
+
+
+class Rule:
+    """One trigger rule, parsed and compiled once.
+
+    The compiled expression runs on one day's scalars (live checks) or on
+    whole history arrays (backtests) alike.
+    """
+
+    def __init__(self, name, when, message=None):
+        self.name = name
+        self.when = when
+        self.message = message or f"{name} rule matched: {when}"
+        try:
+            tree = ast.parse(when, mode="eval")
+        except SyntaxError as e:
+            raise ValueError(f"Rule {name}: cannot parse {when!r}: {e.msg}") from None
+        compiler = RuleCompiler(name)
+        tree = ast.fix_missing_locations(compiler.visit(tree))
+        self.variables = compiler.variables
+        self.windows = compiler.windows
+        self.code = compile(tree, f"<rule {name}>", "eval")
+        self.time_days = self.simple_time_threshold(tree.body)
+
+    @staticmethod
+    def simple_time_threshold(node):
+        """N for a rule of the form `days_since >= N` (or > N), else None"""
+        if isinstance(node, ast.Compare) and isinstance(node.left, ast.Name) and node.left.id == "days_since" \
+                and isinstance(node.ops[0], (ast.GtE, ast.Gt)) and isinstance(node.comparators[0], ast.Constant):
+            value = node.comparators[0].value
+            return int(np.ceil(value)) if isinstance(node.ops[0], ast.GtE) else int(np.floor(value)) + 1
+        return None
+
+    def evaluate(self, env):
+        """Boolean result (scalar or array, like the env's values)"""
+        return eval(self.code, EVAL_GLOBALS, env)
+
+
+class RuleSet:
+    """Ordered trigger rules; the first one that fires is the one executed"""
+
+    def __init__(self, rules, params):
+        self.rules = rules
+        self.params = params
+        self.names = [rule.name for rule in rules]
+        windows = set().union(*(rule.windows for rule in rules))
+        if 'sma_window' in params:
+            windows.add(params['sma_window'])  # messages report the distance from this SMA
+        self.sma_windows = sorted(windows)
+
+    def __iter__(self):
+        return iter(self.rules)
+
+    def day_env(self, market_data, days_since):
+        """Scalar env for one day's market_data (missing values are NaN, so they never fire)"""
+        env = {name: np.nan if market_data.get(name) is None else market_data[name]
+               for name in VARIABLES}
+        env["close"] = market_data['nifty_close']
+        env["days_since"] = days_since
+        smas = {self.params.get('sma_window'): market_data.get('sma_20'), **market_data.get('sma', {})}
+        for window in self.sma_windows:
+            env[f"sma_{window}"] = np.nan if smas.get(window) is None else smas[window]
+        return env
+
+    def check(self, market_data, days_since):
+        """Triggers firing on one day as check_triggers returns them"""
+        env = self.day_env(market_data, days_since)
+        triggers = []
+        for rule in self.rules:
+            if rule.evaluate(env):
+                triggers.append({"type": rule.name, "message": self.format_message(rule, env, market_data)})
+        return triggers
+
+    def format_message(self, rule, env, market_data):
+        sma = env.get(f"sma_{self.params.get('sma_window')}", np.nan)
+        values = {**self.params, **market_data, **{k: v for k, v in env.items() if v == v},
+                  "sma": sma, "below_sma_pct": (sma - env["close"]) / sma * 100}
+        try:
+            return rule.message.format_map(values)
+        except (KeyError, ValueError, TypeError) as e:
+            print(f"Cannot format message of rule {rule.name}: {e}")
+            return rule.message
+
+    def history_env(self, closes, vix, sma=None, **series):
+        """Array env over aligned history; variables without a series are all-NaN.
+
+        sma may map windows to precomputed SMA arrays of the closes.
+        """
+        closes = np.asarray(closes, dtype=np.float64)
+        missing = np.full(len(closes), np.nan)
+        env = {name: np.asarray(series[name], dtype=np.float64) if name in series else missing
+               for name in VARIABLES}
+        env["close"] = closes
+        env["vix"] = np.asarray(vix, dtype=np.float64)
+        sma = sma or {}
+        for window in self.sma_windows:
+            env[f"sma_{window}"] = sma[window] if window in sma else rolling_sma(closes, window)
+        return env
+
+    def backtest(self, closes, vix, prices=None, amount=1.0, sma=None, **series):
+        """Replay the rules over aligned arrays (same result as backtest.backtest_arrays).
+
+        Rules without days_since are evaluated over the whole history at once.
+        days_since depends on the investments made, so those rules must have
+        the form `days_since >= N` and drive the investment day selection.
+        """
+        env = self.history_env(closes, vix, sma, **series)
+        closes = env["close"]
+        prices = closes if prices is None else np.asarray(prices, dtype=np.float64)
+        signal = np.zeros(len(closes), dtype=bool)
+        time_days = len(closes) + 1
+        with np.errstate(invalid="ignore", divide="ignore"):
+            for rule in self.rules:
+                if "days_since" not in rule.variables:
+                    signal |= np.broadcast_to(rule.evaluate(env), signal.shape)
+                elif rule.time_days is None:
+                    raise ValueError(f"Rule {rule.name}: backtests only support days_since as 'days_since >= N'")
+                else:
+                    time_days = min(time_days, max(rule.time_days, 1))
+            invest_idx = select_signal_days(signal, time_days)
+
+            # Re-evaluate every rule on the investment days to find which one fired first
+            day_env = {name: values[invest_idx] for name, values in env.items()}
+            day_env["days_since"] = np.diff(invest_idx, prepend=invest_idx[:1])
+            codes = np.full(len(invest_idx), -1, dtype=np.int8)
+            for code, rule in enumerate(self.rules):
+                fired = np.broadcast_to(rule.evaluate(day_env), codes.shape)
+                codes[(codes < 0) & fired] = code
+        return fill_investments(invest_idx, codes, prices, amount)
+
+
+def read_rules(path):
+    """(name, when, message) tuples from an ini or YAML rules file, in file order"""
+    if path.endswith((".yml", ".yaml")):
+        import yaml  # optional; only needed for YAML rule files
+        with open(path) as f:
+            data = yaml.safe_load(f) or {}
+        # Either a mapping of name -> {when, message} or a list of {name, when, message}
+        items = data.items() if isinstance(data, dict) else [(item['name'], item) for item in data]
+        return [(name, str(spec['when']), spec.get('message')) for name, spec in items]
+
+    # No interpolation: messages contain literal % signs
+    parser = configparser.ConfigParser(interpolation=None)
+    parser.optionxform = str
+    if not parser.read(path):
+        raise FileNotFoundError(path)
+    return [(name, parser[name]['when'], parser[name].get('message')) for name in parser.sections()]
+
+
+def load_rules(path=None, params=None):
+    """Compile the rules in path (default NIFTY_RULES, then triggers.ini) or the built-in ones.
+
+    {param} placeholders in a rule are filled from params before parsing.
+    """
+    params = params or {}
+    path = path or os.getenv('NIFTY_RULES') or ('triggers.ini' if os.path.exists('triggers.ini') else None)
+    specs = read_rules(path) if path else DEFAULT_RULES
+    rules = []
+    for name, when, message in specs:
+        try:
+            when = when.format_map(params)
+        except KeyError as e:
+            raise ValueError(f"Rule {name}: unknown parameter {e}") from None
+        rules.append(Rule(name, when, message))
+    return RuleSet(rules, params)
@@ -0,0 +1,125 @@
+# scheduler.py
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import schedule
+from nifty_agent import NiftyInvestmentAgent, load_env
+from metrics import METRICS
+from trading_calendar import nse_calendar
+
+IST = timezone(timedelta(hours=5, minutes=30))
+
+
+class SchedulerDaemon:
+    """Resident process that runs the daily check at 15:00 IST on NSE trading days.
+
+    The agent is built once and reused, so its bar store, streaming SMA,
+    data provider sessions and Twilio client stay warm between checks. A small
+    HTTP server reports health and the last run on /health and Prometheus
+    metrics on /metrics.
+    """
+
+    def __init__(self, agent=None, run_at="15:00", host="127.0.0.1", port=8765):
+        self.agent = agent or NiftyInvestmentAgent()
+        self.run_at = run_at
+        self.host = host
+        self.port = port
+        self.lock = threading.Lock()
+        self.started_at = datetime.now(IST)
+        self.last_run = None
+        self.last_result = None
+        self.last_error = None
+        self.server = None
+
+    def is_trading_day(self, day):
+        """NSE session per the exchange holiday calendar (no network call)"""
+        return nse_calendar().is_session(day)
+
+    def run_check(self):
+        """Scheduled job: run daily_check unless today is not a trading day"""
+        today = datetime.now(IST).date()
+        if not self.is_trading_day(today):
+            print(f"{today} is not a trading day, skipping check")
+            return
+
+        with self.lock:
+            self.last_run = datetime.now(IST)
+            try:
+                # The dashboard may have invested since our last check
+                self.agent.refresh_state()
+                self.last_result = self.agent.daily_check()
+                self.last_error = None
+                print(self.last_result['message'])
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"Daily check failed: {e}")
+
+    def status(self):
+        next_run = schedule.next_run()
+        with self.lock:
+            return {
+                "status": "error" if self.last_error else "ok",
+                "started_at": self.started_at.isoformat(),
+                "next_run": next_run.isoformat() if next_run else None,
+                "last_run": self.last_run.isoformat() if self.last_run else None,
+                "last_result": self.last_result,
+                "last_error": self.last_error,
+                "metrics": METRICS.snapshot(),
+                "last_investment_date": self.agent.state['last_investment_date'],
+                "trading_days_since_last_investment": self.agent.state['trading_days_since_last_investment']
+            }
+
+    def serve_status(self):
+        """Start the /health endpoint on a background thread"""
+        daemon = self
+
+        class StatusHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.rstrip("/")
+                if path == "/metrics":
+                    body, content_type = METRICS.render_prometheus().encode(), "text/plain; version=0.0.4"
+                elif path in ("/health", "/status"):
+                    body, content_type = json.dumps(daemon.status(), default=str).encode(), "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # probes hit this constantly
+
+        self.server = ThreadingHTTPServer((self.host, self.port), StatusHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        print(f"Status endpoint on http://{self.host}:{self.port}/health")
+
+    def run_forever(self):
+        schedule.every().day.at(self.run_at, "Asia/Kolkata").do(self.run_check)
+        self.serve_status()
+        # Deliver alerts left queued by earlier runs
+        self.agent.outbox.start()
+        print(f"Scheduler started, next check at {schedule.next_run()}")
+        try:
+            while True:
+                schedule.run_pending()
+                idle = schedule.idle_seconds()
+                time.sleep(max(1, min(idle if idle is not None else 60, 60)))
+        except KeyboardInterrupt:
+            print("Scheduler stopped")
+        finally:
+            self.server.shutdown()
+
+
+if __name__ == "__main__":
+    load_env()
+    SchedulerDaemon(
+        run_at=os.getenv('NIFTY_CHECK_TIME', "15:00"),
+        host=os.getenv('NIFTY_STATUS_HOST', "127.0.0.1"),
+        port=int(os.getenv('NIFTY_STATUS_PORT', "8765"))
+    ).run_forever()
@@ -0,0 +1,415 @@
+# state_store.py
+import copy
+import json
+import os
+import sqlite3
+import threading
+from atomic_io import atomic_write
+
+HISTORY_KEY = "investment_history"
+SEQ_KEY = "_journal_seq"  # last journal entry folded into the snapshot
+HISTORY_HEADER_KEY = "_history"  # CompactStateStore: what the snapshot's history rows hold
+
+
+def atomic_write_json(path, data):
+    """Write JSON via temp file + fsync + rename so readers never see a partial file"""
+    with atomic_write(path) as f:
+        json.dump(data, f, indent=4)
+
+
+def atomic_write_json_lines(path, entries):
+    """Replace a JSON-lines file atomically"""
+    with atomic_write(path) as f:
+        f.writelines(json.dumps(entry) + "\n" for entry in entries)
+
+
+class StateStore:
+    """Base class for state backends.
+
+    Remembers what was last persisted so subclasses write only the changed
+    top-level values and the new history records on every save().
+    """
+
+    def __init__(self):
+        self.persisted = None  # top-level values as last written, minus the history
+        self.history_len = 0
+        self.query_cache = None  # (version, state) read for the history queries
+
+    def load(self):
+        """Return the stored state, or None if nothing has been saved yet"""
+        raise NotImplementedError
+
+    def save(self, state):
+        raise NotImplementedError
+
+    def files(self):
+        """Files holding the state, used to detect changes by other processes"""
+        raise NotImplementedError
+
+    def version(self):
+        """Token that changes whenever any process writes the state"""
+        version = []
+        for path in self.files():
+            try:
+                stat = os.stat(path)
+                version.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                version.append(None)
+        return tuple(version)
+
+    def changes(self, state):
+        """Top-level values changed since the last save and the history records added since"""
+        persisted = self.persisted or {}
+        changed = {key: value for key, value in state.items()
+                   if key != HISTORY_KEY and (key not in persisted or persisted[key] != value)}
+        return changed, state.get(HISTORY_KEY, [])[self.history_len:]
+
+    def _remember(self, state):
+        self.persisted = copy.deepcopy({key: value for key, value in state.items() if key != HISTORY_KEY})
+        self.history_len = len(state.get(HISTORY_KEY, []))
+
+    def query_state(self):
+        """Stored state for the history queries, re-read only when version() changes.
+
+        The read goes through a copy of the store, so queries never reset what
+        this store remembers having persisted for the agent's next save().
+        """
+        version = self.version()
+        if self.query_cache is None or self.query_cache[0] != version:
+            self.query_cache = (version, copy.copy(self).load() or {})
+        return self.query_cache[1]
+
+    # History queries; backends with indexed storage override these
+    def history_page(self, limit=50, offset=0, trigger=None):
+        """History records newest first, optionally only one trigger type"""
+        history = self.query_state().get(HISTORY_KEY, [])
+        if trigger is not None:
+            history = [record for record in history if record['trigger'] == trigger]
+        history = sorted(history, key=lambda record: record['date'], reverse=True)
+        return history[offset:offset + limit]
+
+    def history_count(self, trigger=None):
+        history = self.query_state().get(HISTORY_KEY, [])
+        return sum(1 for record in history if trigger is None or record['trigger'] == trigger)
+
+    def trigger_counts(self):
+        """Number of investments per trigger type"""
+        counts = {}
+        for record in self.query_state().get(HISTORY_KEY, []):
+            counts[record['trigger']] = counts.get(record['trigger'], 0) + 1
+        return counts
+
+
+class JournalStateStore(StateStore):
+    """Agent state kept as a compacted JSON snapshot plus an append-only journal.
+
+    save() appends only what changed since the last save (changed top-level
+    values and new history records), so its cost does not grow with the
+    history. Every `compact_every` journal entries the state is folded back
+    into the snapshot and the journal starts over.
+    """
+
+    def __init__(self, path="investment_state.json", compact_every=500):
+        super().__init__()
+        self.path = path
+        self.journal_path = os.path.splitext(path)[0] + ".journal"
+        self.compact_every = compact_every
+        self.seq = 0
+        self.journal_entries = 0
+        self.torn = False  # journal ends in a partial line and must be rewritten
+
+    def files(self):
+        return [self.path, self.journal_path]
+
+    def load(self):
+        # Open the journal before reading the snapshot: a concurrent compaction
+        # replaces the snapshot first, so whichever journal we hold is still
+        # consistent with the snapshot we read afterwards.
+        try:
+            journal = open(self.journal_path, 'r')
+        except FileNotFoundError:
+            journal = None
+
+        state = self.read_snapshot()
+        snapshot_seq = state.pop(SEQ_KEY, 0) if state is not None else 0
+        self.seq = snapshot_seq
+        self.journal_entries = 0
+        self.torn = False
+        if journal is not None:
+            with journal:
+                for line in journal:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        self.torn = True  # partial final line from an interrupted append
+                        break
+                    if entry["seq"] <= snapshot_seq:
+                        continue
+                    if state is None:
+                        state = {HISTORY_KEY: []}
+                    if entry["op"] == "append":
+                        state[entry["key"]].append(entry["value"])
+                    else:
+                        state[entry["key"]] = entry["value"]
+                    self.seq = entry["seq"]
+                    self.journal_entries += 1
+
+        if state is not None:
+            self._remember(state)
+        return state
+
+    def save(self, state):
+        """Persist state, appending only the changes since the last save"""
+        history = state.get(HISTORY_KEY, [])
+        if (self.persisted is None or self.torn or not os.path.exists(self.path)
+                or len(history) < self.history_len):
+            self.compact(state)
+            return
+
+        changed, new_records = self.changes(state)
+        entries = [{"op": "set", "key": key, "value": value} for key, value in changed.items()]
+        entries += [{"op": "append", "key": HISTORY_KEY, "value": record} for record in new_records]
+        if not entries:
+            return
+
+        lines = []
+        for entry in entries:
+            self.seq += 1
+            lines.append(json.dumps({"seq": self.seq, **entry}) + "\n")
+        with open(self.journal_path, 'a') as f:
+            f.write("".join(lines))
+            f.flush()
+            os.fsync(f.fileno())
+
+        self.journal_entries += len(entries)
+        self._remember(state)
+        if self.journal_entries >= self.compact_every:
+            self.compact(state)
+
+    def read_snapshot(self):
+        """Snapshot state (with SEQ_KEY) without the journal applied, or None"""
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def write_snapshot(self, state):
+        atomic_write_json(self.path, {**state, SEQ_KEY: self.seq})
+
+    def compact(self, state):
+        """Fold everything into a fresh snapshot and start an empty journal"""
+        self.write_snapshot(state)
+        atomic_write_json_lines(self.journal_path, [])
+        self.journal_entries = 0
+        self.torn = False
+        self._remember(state)
+
+
+class SQLiteStateStore(StateStore):
+    """Agent state in SQLite (WAL mode) with history indexed by date and trigger.
+
+    WAL lets the dashboard read while the agent writes. Each thread gets its
+    own connection, so one store can be shared by Streamlit sessions.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS state (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS investment_history (
+            id INTEGER PRIMARY KEY,
+            date TEXT NOT NULL,
+            trigger TEXT NOT NULL,
+            message TEXT,
+            record TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_history_date ON investment_history (date);
+        CREATE INDEX IF NOT EXISTS idx_history_trigger_date ON investment_history (trigger, date);
+    """
+
+    def __init__(self, path="investment_state.db", import_from=None):
+        super().__init__()
+        self.path = path
+        self.import_from = import_from  # JSON state migrated into an empty database
+        self.local = threading.local()
+        self.connection().executescript(self.SCHEMA)
+
+    def files(self):
+        # Commits land in the WAL file until a checkpoint folds them into the database
+        return [self.path, self.path + "-wal"]
+
+    def connection(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def load(self):
+        conn = self.connection()
+        with conn:
+            # One read transaction so state and history come from the same snapshot
+            conn.execute("BEGIN")
+            rows = conn.execute("SELECT key, value FROM state").fetchall()
+            history = [json.loads(record) for (record,) in
+                       conn.execute("SELECT record FROM investment_history ORDER BY id")]
+
+        if not rows:
+            if self.import_from and os.path.exists(self.import_from):
+                state = JournalStateStore(self.import_from).load()
+                if state is not None:
+                    self.save(state)
+                return state
+            return None
+
+        state = {key: json.loads(value) for key, value in rows}
+        state[HISTORY_KEY] = history
+        self._remember(state)
+        return state
+
+    def save(self, state):
+        conn = self.connection()
+        history = state.get(HISTORY_KEY, [])
+        with conn:
+            if self.persisted is None:
+                self.history_len = conn.execute("SELECT COUNT(*) FROM investment_history").fetchone()[0]
+            if len(history) < self.history_len:
+                # History was rewritten rather than appended to
+                conn.execute("DELETE FROM investment_history")
+                self.history_len = 0
+
+            changed, new_records = self.changes(state)
+            conn.executemany(
+                "INSERT INTO state (key, value) VALUES (?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+                [(key, json.dumps(value)) for key, value in changed.items()]
+            )
+            conn.executemany(
+                "INSERT INTO investment_history (date, trigger, message, record) VALUES (?, ?, ?, ?)",
+                [(record['date'], record['trigger'], record.get('message'), json.dumps(record))
+                 for record in new_records]
+            )
+        self._remember(state)
+
+    def history_page(self, limit=50, offset=0, trigger=None):
+        where, args = ("WHERE trigger = ?", [trigger]) if trigger is not None else ("", [])
+        rows = self.connection().execute(
+            f"SELECT record FROM investment_history {where} ORDER BY date DESC, id DESC LIMIT ? OFFSET ?",
+            args + [limit, offset]
+        )
+        return [json.loads(record) for (record,) in rows]
+
+    def history_count(self, trigger=None):
+        where, args = ("WHERE trigger = ?", [trigger]) if trigger is not None else ("", [])
+        return self.connection().execute(f"SELECT COUNT(*) FROM investment_history {where}", args).fetchone()[0]
+
+    def trigger_counts(self):
+        rows = self.connection().execute("SELECT trigger, COUNT(*) FROM investment_history GROUP BY trigger")
+        return dict(rows.fetchall())
+
+
+class CompactStateStore(JournalStateStore):
+    """Journal store whose snapshot keeps investment_history as a binary record array.
+
+    History records are fixed-width rows (records.RECORD_DTYPE: trigger as a
+    byte, date as int32 days since the epoch, numbers as float64) in a .npy
+    named by a JSON snapshot of the other values. Messages are formatted
+    again from the numbers when a record is read, so loading memory-maps the rows
+    however long the history is, and history queries decode only the
+    records they return. New records are journaled as usual.
+    """
+
+    def __init__(self, path="investment_state.compact.json", compact_every=500, import_from=None):
+        super().__init__(path, compact_every)
+        self.history_stem = os.path.splitext(path)[0]
+        self.import_from = import_from  # JSON state migrated into an empty store
+
+    def history_file(self, header):
+        """Path of the rows a snapshot's history header describes"""
+        name = header.get("file", os.path.basename(self.history_stem) + ".npy")
+        return os.path.join(os.path.dirname(self.path), name)
+
+    def load(self):
+        state = super().load()
+        if state is None and self.import_from and os.path.exists(self.import_from):
+            state = JournalStateStore(self.import_from).load()
+            if state is not None:
+                self.save(state)
+        return state
+
+    def read_snapshot(self):
+        from records import RecordArray
+        for _ in range(5):
+            state = super().read_snapshot()
+            if state is None:
+                return None
+            if HISTORY_KEY in state:
+                # Snapshot written by JournalStateStore: encoded at the next compaction
+                state[HISTORY_KEY] = RecordArray.from_records(state[HISTORY_KEY])
+                return state
+            header = state.pop(HISTORY_HEADER_KEY, None)
+            try:
+                history = RecordArray.load(self.history_file(header), header) if header is not None else None
+            except FileNotFoundError:
+                history = None
+            # A compaction between the two reads removes the rows this
+            # snapshot names once its own snapshot is in place: read both again
+            if history is not None:
+                state[HISTORY_KEY] = history
+                return state
+        raise RuntimeError(f"{self.path} kept changing while it was being read")
+
+    def write_snapshot(self, state):
+        from records import RecordArray
+        history = state.get(HISTORY_KEY, [])
+        if not isinstance(history, RecordArray):
+            # Swap the caller's list for the array so later saves append to it instead of re-encoding
+            history = state[HISTORY_KEY] = RecordArray.from_records(history)
+        # Every snapshot gets its own rows file, written before the snapshot
+        # naming it, so a crash in between leaves the previous pair intact
+        name = f"{os.path.basename(self.history_stem)}.{self.seq}.{os.urandom(4).hex()}.npy"
+        header = {**history.save(os.path.join(os.path.dirname(self.path), name)), "file": name}
+        atomic_write_json(self.path, {**{k: v for k, v in state.items() if k != HISTORY_KEY},
+                                      HISTORY_HEADER_KEY: header, SEQ_KEY: self.seq})
+        self.remove_stale_history(name)
+
+    def remove_stale_history(self, current):
+        """Delete rows files no snapshot names any more (readers retry if theirs goes)"""
+        directory = os.path.dirname(self.path) or "."
+        prefix = os.path.basename(self.history_stem) + "."
+        for name in os.listdir(directory):
+            if name.startswith(prefix) and name.endswith(".npy") and name != current:
+                try:
+                    os.remove(os.path.join(directory, name))
+                except OSError:
+                    pass  # still open elsewhere (Windows): removed at a later compaction
+
+    def history(self):
+        return self.query_state().get(HISTORY_KEY)
+
+    def history_page(self, limit=50, offset=0, trigger=None):
+        history = self.history()
+        return history.page(limit, offset, trigger) if history is not None else []
+
+    def history_count(self, trigger=None):
+        history = self.history()
+        return history.count(trigger) if history is not None else 0
+
+    def trigger_counts(self):
+        history = self.history()
+        return history.counts() if history is not None else {}
+
+
+def make_state_store(backend="json", state_file="investment_state.json"):
+    """State store for a backend name: json (snapshot + journal), compact (binary history) or sqlite"""
+    if backend == "json":
+        return JournalStateStore(state_file)
+    if backend == "compact":
+        return CompactStateStore(os.path.splitext(state_file)[0] + ".compact.json", import_from=state_file)
+    if backend == "sqlite":
+        return SQLiteStateStore(os.path.splitext(state_file)[0] + ".db", import_from=state_file)
+    raise ValueError(f"Unknown state backend: {backend}")
@@ -0,0 +1,144 @@
+# sweep.py
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+from backtest import align_bars, backtest_arrays, rolling_sma
+
+PARAM_NAMES = ["dip_threshold", "vix_level", "sma_window", "time_days"]
+
+
+def parameter_grid(dip_thresholds, vix_levels, sma_windows, time_days):
+    """Every combination of the given threshold values"""
+    return [dict(zip(PARAM_NAMES, values))
+            for values in itertools.product(dip_thresholds, vix_levels, sma_windows, time_days)]
+
+
+def random_parameters(n, dip_range=(-5.0, -1.0), vix_range=(15.0, 35.0),
+                      sma_range=(5, 60), time_range=(5, 40), seed=None):
+    """n combinations drawn uniformly from the given ranges (integer ranges inclusive)"""
+    rng = np.random.default_rng(seed)
+    dips = rng.uniform(*dip_range, n).round(2)
+    vix_levels = rng.uniform(*vix_range, n).round(1)
+    windows = rng.integers(sma_range[0], sma_range[1] + 1, n)
+    days = rng.integers(time_range[0], time_range[1] + 1, n)
+    return [dict(zip(PARAM_NAMES, (float(a), float(b), int(c), int(d))))
+            for a, b, c, d in zip(dips, vix_levels, windows, days)]
+
+
+class SharedArrays:
+    """Copies named arrays into shared memory blocks that worker processes attach to"""
+
+    def __init__(self, arrays):
+        self.blocks = []
+        self.descriptors = {}
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[:] = array
+            self.blocks.append(block)
+            self.descriptors[name] = (block.name, array.shape, array.dtype.str)
+
+    def close(self):
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def attach_arrays(descriptors):
+    """Map shared blocks described by SharedArrays.descriptors into NumPy arrays"""
+    blocks, arrays = [], {}
+    for name, (block_name, shape, dtype) in descriptors.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        blocks.append(block)
+        arrays[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+    return blocks, arrays
+
+
+# Per-worker state set up once by _init_worker
+_worker = {}
+
+
+def _init_worker(descriptors):
+    _worker["blocks"], _worker["arrays"] = attach_arrays(descriptors)
+    _worker["sma"] = {}
+
+
+def _worker_sma(window):
+    """SMA arrays are shared by every combination with the same window"""
+    cache = _worker["sma"]
+    if window not in cache:
+        cache[window] = rolling_sma(_worker["arrays"]["closes"], window)
+    return cache[window]
+
+
+def _run_chunk(combinations):
+    arrays = _worker["arrays"]
+    rows = []
+    for params in combinations:
+        result = backtest_arrays(arrays["closes"], arrays["vix"], arrays.get("prices"),
+                                 sma=_worker_sma(params["sma_window"]), **params)
+        rows.append({
+            **params,
+            "investments": len(result["index"]),
+            "invested": result["invested"],
+            "portfolio_value": result["portfolio_value"],
+            "return_pct": result["return_pct"],
+            "avg_price": result["invested"] / result["units"].sum() if len(result["units"]) else np.nan
+        })
+    return rows
+
+
+def run_sweep(closes, vix, combinations, prices=None, max_workers=None, chunksize=256):
+    """Backtest every parameter combination in parallel and rank them by return.
+
+    The price arrays are placed in shared memory once; workers attach to them
+    instead of receiving pickled copies with every task.
+    """
+    arrays = {"closes": np.asarray(closes, dtype=np.float64), "vix": np.asarray(vix, dtype=np.float64)}
+    if prices is not None:
+        arrays["prices"] = np.asarray(prices, dtype=np.float64)
+
+    # Group combinations by SMA window so each worker computes few SMA arrays
+    combinations = sorted(combinations, key=lambda params: params["sma_window"])
+    chunks = [combinations[i:i + chunksize] for i in range(0, len(combinations), chunksize)]
+
+    rows = []
+    with SharedArrays(arrays) as shared:
+        with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count(),
+                                 initializer=_init_worker, initargs=(shared.descriptors,)) as pool:
+            for chunk_rows in pool.map(_run_chunk, chunks):
+                rows.extend(chunk_rows)
+
+    results = pd.DataFrame(rows, columns=PARAM_NAMES + ["investments", "invested", "portfolio_value", "return_pct", "avg_price"])
+    results = results.sort_values(["return_pct", "avg_price"], ascending=[False, True], ignore_index=True)
+    results.insert(0, "rank", np.arange(1, len(results) + 1))
+    return results
+
+
+def sweep_history(nifty_hist, vix_hist, combinations, etf_hist=None, **kwargs):
+    """run_sweep over history frames as returned by NiftyInvestmentAgent.load_history"""
+    aligned = align_bars(nifty_hist, vix_hist, etf_hist)
+    return run_sweep(aligned["closes"], aligned["vix"], combinations, aligned.get("prices"), **kwargs)
+
+
+if __name__ == "__main__":
+    from nifty_agent import NiftyInvestmentAgent
+
+    nifty_hist, vix_hist, etf_hist = NiftyInvestmentAgent().load_history()
+    grid = parameter_grid(
+        dip_thresholds=np.arange(-5.0, -0.75, 0.25).round(2),
+        vix_levels=np.arange(16, 32, 1.0),
+        sma_windows=[10, 15, 20, 30, 50],
+        time_days=[10, 15, 20, 25, 30]
+    )
+    print(sweep_history(nifty_hist, vix_hist, grid, etf_hist).head(20).to_string(index=False))
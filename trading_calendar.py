@@ -0,0 +1,112 @@
+# trading_calendar.py
+import os
+import sys
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime
+
+# Weekday trading holidays from the NSE circulars. Outside these years the
+# calendar assumes weekday sessions (and warns about dates after them);
+# NIFTY_HOLIDAYS can name a file of extra holiday dates (one ISO date per
+# line) until the list here is updated.
+NSE_HOLIDAYS = [
+    # 2024
+    "2024-01-22", "2024-01-26", "2024-03-08", "2024-03-25", "2024-03-29", "2024-04-11", "2024-04-17",
+    "2024-05-01", "2024-05-20", "2024-06-17", "2024-07-17", "2024-08-15", "2024-10-02", "2024-11-01",
+    "2024-11-15", "2024-11-20", "2024-12-25",
+    # 2025
+    "2025-02-26", "2025-03-14", "2025-03-31", "2025-04-10", "2025-04-14", "2025-04-18", "2025-05-01",
+    "2025-08-15", "2025-08-27", "2025-10-02", "2025-10-21", "2025-10-22", "2025-11-05", "2025-12-25",
+    # 2026
+    "2026-01-15", "2026-01-26", "2026-03-03", "2026-03-26", "2026-03-31", "2026-04-03", "2026-04-14",
+    "2026-05-01", "2026-05-28", "2026-06-26", "2026-09-14", "2026-10-02", "2026-10-20", "2026-11-10",
+    "2026-11-24", "2026-12-25"
+]
+
+
+def to_date(day):
+    """date from a date, datetime/Timestamp or ISO string"""
+    if isinstance(day, datetime):
+        return day.date()
+    if isinstance(day, str):
+        return date.fromisoformat(day[:10])
+    return day
+
+
+class TradingCalendar:
+    """Exchange sessions as a sorted array of day ordinals.
+
+    Every query is a binary search, so counting the trading days between
+    two dates is O(log n) and needs no market data. listed_until is the last
+    day the holidays are known for: is_session and sessions_between warn
+    (once) when asked about a later day, since it is counted as a session
+    if it is a weekday.
+    """
+
+    def __init__(self, holidays=(), start=date(1990, 1, 1), end=date(2030, 12, 31), listed_until=None):
+        closed = {to_date(day).toordinal() for day in holidays}
+        self.start, self.end = start, end
+        self.listed_until = listed_until
+        self.warned = False
+        self.ordinals = [o for o in range(start.toordinal(), end.toordinal() + 1)
+                         if o % 7 not in (6, 0) and o not in closed]  # ordinal % 7: 6 = Saturday, 0 = Sunday
+
+    def check_listed(self, day):
+        if self.listed_until is not None and day > self.listed_until and not self.warned:
+            self.warned = True
+            print(f"Warning: no holidays listed after {self.listed_until}, so {day} and later weekdays count as "
+                  f"sessions. Update NSE_HOLIDAYS or list the holidays in a NIFTY_HOLIDAYS file.", file=sys.stderr)
+
+    def is_session(self, day):
+        day = to_date(day)
+        self.check_listed(day)
+        o = day.toordinal()
+        i = bisect_left(self.ordinals, o)
+        return i < len(self.ordinals) and self.ordinals[i] == o
+
+    def sessions_between(self, start, end):
+        """Number of sessions after start up to and including end"""
+        end = to_date(end)
+        self.check_listed(end)
+        return max(0, bisect_right(self.ordinals, end.toordinal())
+                   - bisect_right(self.ordinals, to_date(start).toordinal()))
+
+    def previous_session(self, day):
+        """Latest session on or before day"""
+        i = bisect_right(self.ordinals, to_date(day).toordinal())
+        return date.fromordinal(self.ordinals[i - 1]) if i else None
+
+    def next_session(self, day):
+        """First session after day"""
+        i = bisect_right(self.ordinals, to_date(day).toordinal())
+        return date.fromordinal(self.ordinals[i]) if i < len(self.ordinals) else None
+
+    def sessions(self, start, end):
+        """Session dates from start to end inclusive"""
+        lo = bisect_left(self.ordinals, to_date(start).toordinal())
+        hi = bisect_right(self.ordinals, to_date(end).toordinal())
+        return [date.fromordinal(o) for o in self.ordinals[lo:hi]]
+
+    def last_sessions(self, end, n):
+        """The n sessions up to and including end, oldest first"""
+        hi = bisect_right(self.ordinals, to_date(end).toordinal())
+        if n > hi:
+            raise ValueError(f"Calendar starts {self.start}, fewer than {n} sessions before {end}")
+        return [date.fromordinal(o) for o in self.ordinals[hi - n:hi]]
+
+
+def read_holidays(path):
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+_nse = None
+
+
+def nse_calendar():
+    """The NSE calendar, built on first use"""
+    global _nse
+    if _nse is None:
+        extra = read_holidays(os.environ['NIFTY_HOLIDAYS']) if os.getenv('NIFTY_HOLIDAYS') else []
+        holidays = NSE_HOLIDAYS + extra
+        _nse = TradingCalendar(holidays, listed_until=date(max(to_date(day).year for day in holidays), 12, 31))
+    return _nse
@@ -0,0 +1,154 @@
+# walkforward.py
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from backtest import align_bars, rolling_sma, DEFAULT_PARAMS
+from breadth import BREADTH_PARAMS
+from rules import load_rules
+from sweep import PARAM_NAMES, SharedArrays, _init_worker, _worker, parameter_grid
+
+OBJECTIVES = {
+    "return_pct": False,  # maximise
+    "avg_price": True  # minimise the average entry price
+}
+
+
+def rolling_folds(n_days, train_days, test_days, step=None):
+    """(train_start, test_start, test_end) index triples of consecutive walk-forward folds"""
+    step = step or test_days
+    return [(start, start + train_days, min(start + train_days + test_days, n_days))
+            for start in range(0, n_days - train_days - 1, step)]
+
+
+def score(result, objective):
+    if objective == "avg_price":
+        return result["invested"] / result["units"].sum() if len(result["units"]) else np.inf
+    return result[objective]
+
+
+def compile_rules(params, rules_path=None):
+    """The agent's trigger rules (NIFTY_RULES / triggers.ini / built-in) with params applied"""
+    return load_rules(rules_path, params={**DEFAULT_PARAMS, **BREADTH_PARAMS, **params})
+
+
+def _fold_rules(params, rules_path):
+    """Rules compiled once per worker for each parameter combination (compiled code cannot be pickled)"""
+    cache = _worker.setdefault("rules", {})
+    key = tuple(sorted(params.items()))
+    if key not in cache:
+        cache[key] = compile_rules(params, rules_path)
+    return cache[key]
+
+
+def _fold_backtest(lo, hi, params, rules_path=None):
+    """Replay the rules with params on bars [lo, hi) using the shared full-history SMAs (no warm-up gap)"""
+    arrays = _worker["arrays"]
+    rules = _fold_rules(params, rules_path)
+    windows = arrays["sma_windows"].tolist()
+    sma = {window: arrays["sma"][windows.index(window)][lo:hi] for window in rules.sma_windows}
+    prices = arrays.get("prices")
+    return rules.backtest(arrays["closes"][lo:hi], arrays["vix"][lo:hi],
+                          prices[lo:hi] if prices is not None else None, sma=sma)
+
+
+def _run_fold(task):
+    """Optimise on the fold's in-sample window, then score the winner out of sample"""
+    (train_start, test_start, test_end), combinations, objective, rules_path = task
+    minimise = OBJECTIVES[objective]
+    best, best_score, best_result = None, None, None
+    for params in combinations:
+        result = _fold_backtest(train_start, test_start, params, rules_path)
+        value = score(result, objective)
+        if best is None or (value < best_score if minimise else value > best_score):
+            best, best_score, best_result = params, value, result
+
+    out_of_sample = _fold_backtest(test_start, test_end, best, rules_path)
+    default = _fold_backtest(test_start, test_end, {key: DEFAULT_PARAMS[key] for key in PARAM_NAMES}, rules_path)
+    return {
+        **best,
+        "in_sample_return_pct": best_result["return_pct"],
+        "oos_return_pct": out_of_sample["return_pct"],
+        "oos_investments": len(out_of_sample["index"]),
+        "oos_avg_price": score(out_of_sample, "avg_price"),
+        "default_oos_return_pct": default["return_pct"],
+        "default_oos_avg_price": score(default, "avg_price")
+    }
+
+
+def walk_forward(closes, vix, combinations, prices=None, dates=None, train_days=756, test_days=252,
+                 step=None, objective="return_pct", max_workers=None, rules_path=None):
+    """Rolling in-sample optimisation with out-of-sample scoring, one fold per worker task.
+
+    Every combination is applied to the agent's own trigger rules (see
+    compile_rules), so the strategy tuned is the one the live agent runs.
+    The SMA of every window the rules use is computed once over the whole
+    history and shared with the workers together with the prices, so folds
+    slice the same indicator arrays instead of recomputing them. Returns one
+    row per fold with the chosen thresholds, their out-of-sample result and
+    that of the default thresholds over the same window.
+    """
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Unknown objective: {objective}")
+    closes = np.asarray(closes, dtype=np.float64)
+    combinations = list(combinations)
+    default = {key: DEFAULT_PARAMS[key] for key in PARAM_NAMES}
+    # Compiling here also rejects combinations the rules cannot use before any worker starts
+    windows = sorted({int(window) for params in combinations + [default]
+                      for window in compile_rules(params, rules_path).sma_windows})
+    arrays = {
+        "closes": closes,
+        "vix": np.asarray(vix, dtype=np.float64),
+        "sma": np.stack([rolling_sma(closes, window) for window in windows]),
+        "sma_windows": np.asarray(windows, dtype=np.int64)
+    }
+    if prices is not None:
+        arrays["prices"] = np.asarray(prices, dtype=np.float64)
+
+    folds = rolling_folds(len(closes), train_days, test_days, step)
+    with SharedArrays(arrays) as shared:
+        with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count(),
+                                 initializer=_init_worker, initargs=(shared.descriptors,)) as pool:
+            rows = list(pool.map(_run_fold, [(fold, combinations, objective, rules_path) for fold in folds]))
+
+    results = pd.DataFrame(rows)
+    bounds = np.array(folds, dtype=np.int64).reshape(-1, 3)
+    labels = dates if dates is not None else np.arange(len(closes))
+    results.insert(0, "train_start", [labels[i] for i in bounds[:, 0]])
+    results.insert(1, "test_start", [labels[i] for i in bounds[:, 1]])
+    results.insert(2, "test_end", [labels[i - 1] for i in bounds[:, 2]])
+    return results
+
+
+def walk_forward_history(nifty_hist, vix_hist, combinations, etf_hist=None, **kwargs):
+    """walk_forward over history frames as returned by NiftyInvestmentAgent.load_history"""
+    aligned = align_bars(nifty_hist, vix_hist, etf_hist)
+    dates = [day.date().isoformat() for day in aligned["dates"]]
+    return walk_forward(aligned["closes"], aligned["vix"], combinations, aligned.get("prices"), dates, **kwargs)
+
+
+if __name__ == "__main__":
+    import argparse
+    from nifty_agent import NiftyInvestmentAgent
+
+    parser = argparse.ArgumentParser(description="Walk-forward optimisation of the trigger thresholds")
+    parser.add_argument("--start", default="2008-01-01")
+    parser.add_argument("--train-years", type=float, default=3)
+    parser.add_argument("--test-years", type=float, default=1)
+    parser.add_argument("--objective", choices=list(OBJECTIVES), default="return_pct")
+    parser.add_argument("--workers", type=int)
+    args = parser.parse_args()
+
+    nifty_hist, vix_hist, etf_hist = NiftyInvestmentAgent().load_history(args.start)
+    grid = parameter_grid(
+        dip_thresholds=np.arange(-5.0, -0.75, 0.5).round(2),
+        vix_levels=np.arange(16, 32, 2.0),
+        sma_windows=[10, 20, 30, 50],
+        time_days=[10, 15, 20, 25, 30]
+    )
+    results = walk_forward_history(nifty_hist, vix_hist, grid, etf_hist,
+                                   train_days=int(args.train_years * 252), test_days=int(args.test_years * 252),
+                                   objective=args.objective, max_workers=args.workers)
+    print(results.to_string(index=False))
+    print(f"Mean out-of-sample return: {results['oos_return_pct'].mean():.2f}% "
+          f"(default thresholds {results['default_oos_return_pct'].mean():.2f}%)")